@@ -0,0 +1,135 @@
+"""
+Whole-graph analytics for the degrees data set
+
+Computes connected components of the person <-> movie graph, and for a
+sample of source people (always including Kevin Bacon) the histogram of
+degrees of separation to everyone they can reach, their eccentricity and
+average separation. Sources are spread over a process pool, and the
+results are written as CSV files:
+
+    components.csv   component, size, movies, example person_id
+    separation.csv   one row per source, plus an "all" row summing them
+"""
+
+import csv
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import worker
+from graph import UNREACHABLE, load_compact
+
+# Sources always included, resolved by name
+NAMED_SOURCES = ["Kevin Bacon"]
+
+SAMPLES = 100
+SEED = 50
+
+
+def separation(source):
+    """
+    Returns (source, histogram) for one source person integer, where
+    histogram[d] is the number of people exactly d degrees away.
+    """
+    distances = worker.graph.distances([source])
+    # bytearray.count runs in C, so the histogram costs one pass per level
+    eccentricity = max(set(distances) - {UNREACHABLE})
+    return source, [distances.count(d) for d in range(eccentricity + 1)]
+
+
+def summarize(histogram):
+    """
+    Returns (reached, eccentricity, mean separation) for a histogram,
+    not counting the source itself.
+    """
+    reached = sum(histogram[1:])
+    eccentricity = max((d for d, count in enumerate(histogram) if count), default=0)
+    total = sum(d * count for d, count in enumerate(histogram))
+    return reached, eccentricity, total / reached if reached else None
+
+
+def choose_sources(graph, samples):
+    """
+    Returns the named sources found in graph plus samples people drawn
+    with a fixed seed, without repeats.
+    """
+    sources = []
+    for name in NAMED_SOURCES:
+        person_id = graph.person_id_for_name(name, interactive=False)
+        if person_id is not None:
+            sources.append(graph.person_index(person_id))
+    rng = random.Random(SEED)
+    population = range(graph.person_count)
+    for source in rng.sample(population, min(samples, len(population))):
+        if source not in sources:
+            sources.append(source)
+    return sources
+
+
+def write_components(filename, graph, sizes):
+    """
+    Writes one row per component, largest first.
+    """
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["component", "size", "movies", "person_id"])
+        order = sorted(range(len(sizes)), key=lambda c: -sizes[c][0])
+        for rank, component in enumerate(order):
+            size, movie_count, person = sizes[component]
+            writer.writerow([rank, size, movie_count, graph.person_ids[person]])
+
+
+def write_separation(filename, graph, results):
+    """
+    Writes one row per source and an "all" row, returning the summed histogram.
+    """
+    width = max((len(histogram) for _, histogram in results), default=1)
+    total = [0] * width
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "name", "reached", "eccentricity", "mean_separation"]
+                        + [str(d) for d in range(1, width)])
+        for source, histogram in results:
+            histogram = histogram + [0] * (width - len(histogram))
+            for d, count in enumerate(histogram):
+                total[d] += count
+            reached, eccentricity, mean = summarize(histogram)
+            writer.writerow([graph.person_ids[source], graph.person_names[source], reached,
+                             eccentricity, "" if mean is None else f"{mean:.4f}"] + histogram[1:])
+        reached, eccentricity, mean = summarize(total)
+        writer.writerow(["all", "", reached, eccentricity,
+                         "" if mean is None else f"{mean:.4f}"] + total[1:])
+    return total
+
+
+def main():
+    if len(sys.argv) not in (3, 4):
+        sys.exit("Usage: python analytics.py directory output_directory [samples]")
+    directory, output = sys.argv[1], sys.argv[2]
+    samples = int(sys.argv[3]) if len(sys.argv) == 4 else SAMPLES
+    os.makedirs(output, exist_ok=True)
+
+    print("Loading data...")
+    graph = load_compact(directory)
+    print("Data loaded.")
+
+    sources = choose_sources(graph, samples)
+    with ProcessPoolExecutor(os.cpu_count(), initializer=worker.init_worker, initargs=(directory,)) as pool:
+        # Distances run in the workers while components are found here
+        pending = pool.map(separation, sources)
+        _, sizes = graph.components()
+        results = list(pending)
+
+    write_components(os.path.join(output, "components.csv"), graph, sizes)
+    total = write_separation(os.path.join(output, "separation.csv"), graph, results)
+
+    largest = max((size for size, _, _ in sizes), default=0)
+    print(f"{len(sizes)} components, the largest has {largest} of {graph.person_count} people.")
+    _, _, mean = summarize(total)
+    if mean is not None:
+        print(f"Average separation over {len(results)} sources: {mean:.3f} degrees.")
+
+
+if __name__ == "__main__":
+    main()
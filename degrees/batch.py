@@ -0,0 +1,104 @@
+"""
+Batch degrees queries
+
+Reads (source, target) pairs from a CSV file with a source,target header
+and writes one JSON object per pair. Each side is a person_id or a name;
+names are resolved without asking, like person_id_for_name. Pairs that
+share a source are answered by a single BFS, and the sources are
+spread over a process pool.
+"""
+
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import worker
+from graph import load_compact
+
+# Number of sources handed to a worker at a time
+CHUNK_SIZE = 16
+
+
+def answer_source(job):
+    """
+    Answers every target of one source, returning (source, paths).
+    """
+    source, targets = job
+    return source, worker.graph.paths_from(source, targets)
+
+
+def read_pairs(filename):
+    """
+    Returns the (source, target) pairs in filename, in file order.
+    """
+    with open(filename, encoding="utf-8") as f:
+        return [(row["source"], row["target"]) for row in csv.DictReader(f)]
+
+
+def resolve_pairs(graph, pairs):
+    """
+    Returns pairs with every name that is not a person_id resolved
+    to a person_id, or to None if nobody matches.
+    """
+    resolved = {}
+
+    def resolve(person):
+        if person not in resolved:
+            if graph.person_index(person) is not None:
+                resolved[person] = person
+            else:
+                resolved[person] = graph.person_id_for_name(person, interactive=False)
+        return resolved[person]
+
+    return [(resolve(source), resolve(target)) for source, target in pairs]
+
+
+def run_batch(directory, pairs, workers=None):
+    """
+    Returns a dict mapping every (source, target) pair to its path,
+    or None if the two are not connected.
+    """
+    # Group the targets by source, so each source is searched only once
+    jobs = {}
+    for source, target in pairs:
+        jobs.setdefault(source, set()).add(target)
+
+    results = {}
+    with ProcessPoolExecutor(workers, initializer=worker.init_worker, initargs=(directory,)) as pool:
+        for source, paths in pool.map(answer_source, jobs.items(), chunksize=CHUNK_SIZE):
+            for target, path in paths.items():
+                results[(source, target)] = path
+    return results
+
+
+def main():
+    if len(sys.argv) not in (3, 4):
+        sys.exit("Usage: python batch.py directory pairs.csv [output.jsonl]")
+    directory, pairs_file = sys.argv[1], sys.argv[2]
+
+    # Load (or build) the snapshot once, before the workers map it
+    graph = load_compact(directory)
+
+    pairs = read_pairs(pairs_file)
+    resolved = resolve_pairs(graph, pairs)
+    results = run_batch(directory, resolved, os.cpu_count())
+
+    output = open(sys.argv[3], "w", encoding="utf-8") if len(sys.argv) == 4 else sys.stdout
+    try:
+        for (source, target), (source_id, target_id) in zip(pairs, resolved):
+            path = results[(source_id, target_id)]
+            output.write(json.dumps({
+                "source": source_id if source_id is not None else source,
+                "target": target_id if target_id is not None else target,
+                "degrees": None if path is None else len(path),
+                "path": path
+            }) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
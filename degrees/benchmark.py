@@ -0,0 +1,301 @@
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import degrees
+from graph import load_compact
+from landmarks import LANDMARKS_NAME, LandmarkOracle
+from snapshot import snapshot_path
+
+# Well known pairs from the IMDb data set, resolved by name
+NAME_PAIRS = [
+    ("Kevin Bacon", "Tom Hanks"),
+    ("Emma Watson", "Jennifer Lawrence"),
+    ("Tom Cruise", "Sally Field"),
+    ("Chris Sarandon", "Gerald R. Molen"),
+    ("Robin Wright", "Dustin Hoffman"),
+]
+
+# Extra pairs are drawn with a fixed seed so every run uses the same ones
+RANDOM_PAIRS = 10
+SEED = 50
+
+
+def fixed_pairs():
+    """
+    Returns the list of (source, target) person_id pairs to benchmark.
+    """
+    pairs = []
+    for name1, name2 in NAME_PAIRS:
+        source = degrees.names.get(name1.lower())
+        target = degrees.names.get(name2.lower())
+        if source and target:
+            pairs.append((min(source), min(target)))
+
+    person_ids = sorted(degrees.people)
+    rng = random.Random(SEED)
+    for _ in range(RANDOM_PAIRS):
+        pairs.append((rng.choice(person_ids), rng.choice(person_ids)))
+    return pairs
+
+
+def timed(function, *args):
+    """
+    Returns the result of calling function and the seconds it took.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def benchmark_search(directory):
+    """
+    Compares shortest_path against bidirectional_search on a fixed set of pairs.
+    """
+    degrees.load_data(directory)
+    pairs = fixed_pairs()
+
+    print(f"{'source':>10} {'target':>10} {'degrees':>7} {'bfs (s)':>10} {'bidir (s)':>10} {'speedup':>8}")
+    total_bfs = total_bidirectional = 0
+    for source, target in pairs:
+        path, bfs_time = timed(degrees.shortest_path, source, target)
+        fast_path, bidirectional_time = timed(degrees.bidirectional_search, source, target)
+
+        # Both searches must agree on the separation, even if the paths differ
+        length = None if path is None else len(path)
+        fast_length = None if fast_path is None else len(fast_path)
+        if length != fast_length:
+            sys.exit(f"Mismatch for {source} -> {target}: {length} vs {fast_length}")
+
+        total_bfs += bfs_time
+        total_bidirectional += bidirectional_time
+        speedup = bfs_time / max(bidirectional_time, 1e-9)
+        print(f"{source:>10} {target:>10} {str(length):>7} "
+              f"{bfs_time:>10.4f} {bidirectional_time:>10.4f} {speedup:>7.1f}x")
+
+    speedup = total_bfs / max(total_bidirectional, 1e-9)
+    print(f"Total: bfs {total_bfs:.3f}s, bidirectional {total_bidirectional:.3f}s, {speedup:.1f}x faster")
+
+
+def benchmark_memory(directory):
+    """
+    Compares memory held and load time of load_data against load_compact,
+    then times the same searches on both representations.
+    """
+    # Both parse the CSVs: a mapped snapshot is not counted by tracemalloc
+    tracemalloc.start()
+    _, dict_time = timed(degrees.load_data, directory, False)
+    dict_memory = tracemalloc.get_traced_memory()[0]
+    pairs = fixed_pairs()
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    graph, compact_time = timed(load_compact, directory, False)
+    compact_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    megabyte = 1024 * 1024
+    print(f"dicts:   {dict_memory / megabyte:8.1f} MB, loaded in {dict_time:.2f}s")
+    print(f"compact: {compact_memory / megabyte:8.1f} MB, loaded in {compact_time:.2f}s")
+    print(f"Compact graph uses {dict_memory / max(compact_memory, 1):.1f}x less memory")
+
+    total_dict = total_compact = 0
+    for source, target in pairs:
+        path, dict_search = timed(degrees.bidirectional_search, source, target)
+        compact_path, compact_search = timed(graph.shortest_path, source, target)
+        if (path is None) != (compact_path is None) or (path and len(path) != len(compact_path)):
+            sys.exit(f"Mismatch for {source} -> {target}")
+        total_dict += dict_search
+        total_compact += compact_search
+    print(f"Searches: dicts {total_dict:.3f}s, compact {total_compact:.3f}s")
+
+
+# Each startup is timed in a fresh interpreter, like a real run of degrees.py
+STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import degrees, graph
+if sys.argv[2] == "compact":
+    graph.load_compact(sys.argv[1])
+else:
+    degrees.load_data(sys.argv[1])
+print(time.perf_counter() - start)
+"""
+
+
+def benchmark_startup(directory):
+    """
+    Reports cold (CSV parse plus snapshot write) and warm (snapshot read)
+    startup times for both loaders.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def startup(loader):
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT, directory, loader],
+            cwd=here, check=True, capture_output=True, text=True
+        ).stdout
+        return float(output.split()[-1])
+
+    for loader in ("dicts", "compact"):
+        if os.path.exists(snapshot_path(directory)):
+            os.remove(snapshot_path(directory))
+        cold = startup(loader)
+        warm = startup(loader)
+        print(f"{loader:>8}: cold {cold:7.2f}s, warm {warm:7.2f}s, {cold / max(warm, 1e-9):.1f}x faster")
+
+
+def benchmark_names(directory):
+    """
+    Reports the average latency of exact, prefix and fuzzy name lookups.
+    """
+    degrees.load_data(directory)
+    index = degrees.name_index
+    rng = random.Random(SEED)
+    queries = rng.sample(index.names, min(1000, len(index.names)))
+
+    # Misspell every query once, swapping two neighbouring letters
+    typos = []
+    for name in queries:
+        i = rng.randrange(max(len(name) - 1, 1))
+        typos.append(name[:i] + name[i + 1:i + 2] + name[i:i + 1] + name[i + 2:])
+
+    lookups = [
+        ("exact", index.exact, queries),
+        ("prefix", index.prefix, [name[:max(3, len(name) // 2)] for name in queries]),
+        ("resolve", lambda name: degrees.person_id_for_name(name, interactive=False), queries),
+        ("fuzzy", index.fuzzy, typos),
+    ]
+    for label, lookup, arguments in lookups:
+        start = time.perf_counter()
+        for argument in arguments:
+            lookup(argument)
+        average = (time.perf_counter() - start) / len(arguments)
+        print(f"{label:>8}: {average * 1e6:10.1f} us per lookup")
+
+
+def benchmark_oracle(directory):
+    """
+    Reports landmark oracle build time, bound accuracy against exact
+    BFS distances, and latency of bounds, BFS and A* queries.
+    """
+    graph = load_compact(directory)
+    oracle, build_time = timed(LandmarkOracle.build, graph)
+    path = os.path.join(directory, LANDMARKS_NAME)
+    oracle.save(path)
+    _, load_time = timed(LandmarkOracle.load, graph, path)
+    print(f"Built {len(oracle.landmarks)} landmarks in {build_time:.2f}s, reloaded in {load_time:.3f}s")
+
+    rng = random.Random(SEED)
+    pairs = [(rng.randrange(graph.person_count), rng.randrange(graph.person_count))
+             for _ in range(50)]
+
+    exact = lower_exact = upper_exact = connected = 0
+    gap = 0
+    bounds_time = bfs_time = pruned_time = astar_time = 0
+    for source, target in pairs:
+        path, seconds = timed(graph.search, source, target)
+        bfs_time += seconds
+        (lower, upper), seconds = timed(oracle.index_bounds, source, target)
+        bounds_time += seconds
+        pruned_path, seconds = timed(oracle.search, source, target)
+        pruned_time += seconds
+        astar_path, seconds = timed(oracle.astar, source, target)
+        astar_time += seconds
+
+        distance = None if path is None else len(path)
+        for other in (pruned_path, astar_path):
+            if (other is None) != (path is None) or (path and len(other) != distance):
+                sys.exit(f"Search mismatch for {source} -> {target}")
+        if distance is None:
+            continue
+        if not lower <= distance <= (upper if upper is not None else math.inf):
+            sys.exit(f"Bounds {lower}..{upper} miss distance {distance}")
+        connected += 1
+        lower_exact += lower == distance
+        upper_exact += upper == distance
+        exact += lower == upper
+        if upper is not None:
+            gap += upper - lower
+
+    count = len(pairs)
+    print(f"Connected pairs: {connected}/{count}")
+    if connected:
+        print(f"Lower bound exact: {lower_exact / connected:.1%}, upper bound exact: {upper_exact / connected:.1%}")
+        print(f"Bounds pin the distance: {exact / connected:.1%}, mean gap {gap / connected:.2f} degrees")
+    print(f"Latency: bounds {bounds_time / count * 1e6:.1f}us, "
+          f"bidirectional BFS {bfs_time / count * 1e3:.2f}ms, "
+          f"pruned bidirectional {pruned_time / count * 1e3:.2f}ms, A* {astar_time / count * 1e3:.2f}ms")
+
+
+# Rows in the generated delta for the ingest benchmark
+DELTA_STARS = 2000000
+DELTA_PEOPLE = 100000
+DELTA_MOVIES = 50000
+
+
+def write_delta(directory, person_ids, movie_ids):
+    """
+    Writes delta people, movies and stars CSVs with new people and movies,
+    and stars that mostly connect existing ones.
+    """
+    rng = random.Random(SEED)
+    new_people = [f"delta-p{i}" for i in range(DELTA_PEOPLE)]
+    new_movies = [f"delta-m{i}" for i in range(DELTA_MOVIES)]
+    with open(os.path.join(directory, "people.csv"), "w", encoding="utf-8") as f:
+        f.write("id,name,birth\n")
+        f.writelines(f"{person_id},Delta Person {i},1990\n" for i, person_id in enumerate(new_people))
+    with open(os.path.join(directory, "movies.csv"), "w", encoding="utf-8") as f:
+        f.write("id,title,year\n")
+        f.writelines(f"{movie_id},Delta Movie {i},2024\n" for i, movie_id in enumerate(new_movies))
+    people_pool = person_ids + new_people
+    movies_pool = movie_ids + new_movies
+    with open(os.path.join(directory, "stars.csv"), "w", encoding="utf-8") as f:
+        f.write("person_id,movie_id\n")
+        for _ in range(DELTA_STARS):
+            f.write(f"{rng.choice(people_pool)},{rng.choice(movies_pool)}\n")
+
+
+def benchmark_ingest(directory):
+    """
+    Reports ingest throughput of delta CSVs into the loaded dicts
+    and into a loaded compact graph.
+    """
+    degrees.load_data(directory)
+    graph = load_compact(directory)
+    with tempfile.TemporaryDirectory() as delta:
+        write_delta(delta, sorted(degrees.people), sorted(degrees.movies))
+
+        touched, seconds = timed(degrees.append_data, delta)
+        print(f"   dicts: {DELTA_STARS} stars in {seconds:.2f}s, "
+              f"{DELTA_STARS / seconds:,.0f} rows/s, {len(touched)} people touched")
+
+        (_, touched), seconds = timed(graph.appended_csv, delta)
+        print(f" compact: {DELTA_STARS} stars in {seconds:.2f}s, "
+              f"{DELTA_STARS / seconds:,.0f} rows/s, {len(touched)} people touched")
+
+
+BENCHMARKS = {
+    "search": benchmark_search,
+    "memory": benchmark_memory,
+    "startup": benchmark_startup,
+    "names": benchmark_names,
+    "oracle": benchmark_oracle,
+    "ingest": benchmark_ingest,
+}
+
+
+def main():
+    if len(sys.argv) not in (2, 3) or sys.argv[1] not in BENCHMARKS:
+        sys.exit(f"Usage: python benchmark.py {'|'.join(BENCHMARKS)} [directory]")
+    directory = sys.argv[2] if len(sys.argv) == 3 else "large"
+    BENCHMARKS[sys.argv[1]](directory)
+
+
+if __name__ == "__main__":
+    main()
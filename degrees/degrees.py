@@ -1,6 +1,9 @@
 import csv
 import sys
 
+from graph import CompactGraph, load_compact, read_rows
+from nameindex import NameIndex
+from snapshot import read_snapshot, source_key, write_snapshot
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -12,8 +15,42 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Prefix and fuzzy search over names, built by load_data
+name_index = None
 
-def load_data(directory):
+
+def load_data(directory, snapshot=True):
+    """
+    Load data from CSV files into memory.
+
+    With snapshot, a fresh snapshot next to the CSVs is read instead
+    of parsing them, and a missing or stale one is rewritten.
+    """
+    global name_index
+
+    columns = key = None
+    if snapshot:
+        try:
+            # Taken before parsing, so edits made meanwhile leave the snapshot stale
+            key = source_key(directory)
+        except OSError:
+            pass
+        columns = read_snapshot(directory)
+    if columns is not None:
+        load_graph(CompactGraph(**columns))
+    else:
+        load_csv(directory)
+        if key is not None:
+            try:
+                write_snapshot(CompactGraph.from_dicts(people, movies), directory, key)
+            except OSError:
+                # A read-only data directory just means every start is cold
+                pass
+
+    name_index = NameIndex(names)
+
+
+def load_csv(directory):
     """
     Load data from CSV files into memory.
     """
@@ -52,24 +89,114 @@ def load_data(directory):
                 pass
 
 
+def load_graph(graph):
+    """
+    Load data from a CompactGraph into memory.
+    """
+    # Decode every id once up front, since each is used by many stars
+    person_ids = list(graph.person_ids)
+    movie_ids = list(graph.movie_ids)
+    for person, person_id in enumerate(person_ids):
+        name = graph.person_names[person]
+        people[person_id] = {
+            "name": name,
+            "birth": graph.person_births[person],
+            "movies": {movie_ids[movie] for movie in graph.movies_of(person)}
+        }
+        names.setdefault(name.lower(), set()).add(person_id)
+
+    for movie, movie_id in enumerate(movie_ids):
+        movies[movie_id] = {
+            "title": graph.movie_titles[movie],
+            "year": graph.movie_years[movie],
+            "stars": {person_ids[person] for person in graph.stars_of(movie)}
+        }
+
+
+def append_data(directory):
+    """
+    Load new rows from delta CSV files in directory into the data already
+    in memory. Any of people.csv, movies.csv and stars.csv may be missing.
+
+    Returns the set of person_ids whose co-stars changed: the stars of
+    every movie that gained a star.
+    """
+    # Add new people, leaving anyone already loaded untouched
+    for row in read_rows(f"{directory}/people.csv"):
+        if row["id"] in people:
+            continue
+        people[row["id"]] = {
+            "name": row["name"],
+            "birth": row["birth"],
+            "movies": set()
+        }
+        names.setdefault(row["name"].lower(), set()).add(row["id"])
+        if name_index is not None:
+            name_index.add(row["name"], row["id"])
+
+    # Add new movies
+    for row in read_rows(f"{directory}/movies.csv"):
+        if row["id"] in movies:
+            continue
+        movies[row["id"]] = {
+            "title": row["title"],
+            "year": row["year"],
+            "stars": set()
+        }
+
+    # Add new stars
+    changed_movies = set()
+    for row in read_rows(f"{directory}/stars.csv"):
+        person_id, movie_id = row["person_id"], row["movie_id"]
+        if person_id not in people or movie_id not in movies:
+            continue
+        stars = movies[movie_id]["stars"]
+        if person_id in stars:
+            continue
+        stars.add(person_id)
+        people[person_id]["movies"].add(movie_id)
+        changed_movies.add(movie_id)
+
+    touched = set()
+    for movie_id in changed_movies:
+        touched.update(movies[movie_id]["stars"])
+    return touched
+
+
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    args = sys.argv[1:]
+    compact = "--compact" in args
+    if compact:
+        args.remove("--compact")
+    if len(args) > 1:
+        sys.exit("Usage: python degrees.py [--compact] [directory]")
+    directory = args[0] if len(args) == 1 else "large"
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    if compact:
+        graph = load_compact(directory)
+        lookup, search = graph.person_id_for_name, graph.shortest_path
+        person_name, movie_title = graph.person_name, graph.movie_title
+    else:
+        load_data(directory)
+        lookup, search = person_id_for_name, bidirectional_search
+
+        def person_name(person_id):
+            return people[person_id]["name"]
+
+        def movie_title(movie_id):
+            return movies[movie_id]["title"]
     print("Data loaded.")
 
-    source = person_id_for_name(input("Name: "))
+    source = lookup(input("Name: "))
     if source is None:
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    target = lookup(input("Name: "))
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = search(source, target)
 
     if path is None:
         print("Not connected.")
@@ -78,9 +205,9 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = person_name(path[i][1])
+            person2 = person_name(path[i + 1][1])
+            movie = movie_title(path[i + 1][0])
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
@@ -134,11 +261,153 @@ def shortest_path(source, target):
             queue.append((neighbor[1], new_path))
 
 
-def person_id_for_name(name):
+def bidirectional_search(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, like shortest_path.
+
+    Searches from both ends at once, one whole BFS level at a time,
+    always growing the smaller frontier. Each side only keeps a parent
+    pointer per person, and the path is rebuilt once the frontiers meet.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Maps person_id to (movie_id, person_id) one step closer to that side's root
+    forward = {source: None}
+    backward = {target: None}
+
+    # Movies already scanned from each side, so every cast is read once per side
+    forward_movies = set()
+    backward_movies = set()
+
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting = expand_level(
+                forward_frontier, forward, forward_movies, backward
+            )
+        else:
+            backward_frontier, meeting = expand_level(
+                backward_frontier, backward, backward_movies, forward
+            )
+        if meeting is not None:
+            return join_paths(meeting, forward, backward)
+
+    # One side ran out of people to explore without meeting the other
+    return None
+
+
+def expand_level(frontier, parents, seen_movies, other_parents):
+    """
+    Expands every person in frontier by one step, recording parent
+    pointers in parents. Returns the next frontier and a person reached
+    by both searches (or None if the searches have not met yet).
+    """
+    next_frontier = []
+    meeting = None
+    meeting_distance = None
+    for person_id in frontier:
+        for movie_id in people[person_id]["movies"]:
+            if movie_id in seen_movies:
+                continue
+            seen_movies.add(movie_id)
+            for neighbor in movies[movie_id]["stars"]:
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = (movie_id, person_id)
+                next_frontier.append(neighbor)
+                if neighbor in other_parents:
+                    # Keep the meeting closest to the other side's root,
+                    # since the rest of this level ties on our side
+                    distance = path_length(neighbor, other_parents)
+                    if meeting is None or distance < meeting_distance:
+                        meeting = neighbor
+                        meeting_distance = distance
+    return next_frontier, meeting
+
+
+def path_length(person_id, parents):
+    """
+    Returns the number of steps from person_id back to the root of parents.
+    """
+    length = 0
+    while parents[person_id] is not None:
+        person_id = parents[person_id][1]
+        length += 1
+    return length
+
+
+def join_paths(meeting, forward, backward):
+    """
+    Builds the (movie_id, person_id) path through meeting from the
+    forward and backward parent pointers.
+    """
+    # Walk back from the meeting person to the source, then reverse
+    path = []
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, previous = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = previous
+    path.reverse()
+
+    # Walk forward from the meeting person to the target
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, person_id = backward[person_id]
+        path.append((movie_id, person_id))
+    return path
+
+
+def paths_from(source, targets):
+    """
+    Returns a dict mapping every person_id in targets to the shortest
+    list of (movie_id, person_id) pairs from source, or None if not
+    connected, using a single BFS from source.
+    """
+    parents = {source: None}
+    seen_movies = set()
+    remaining = set(targets) & people.keys()
+    remaining.discard(source)
+    frontier = [source] if source in people else []
+
+    # Grow whole levels until every target has a parent pointer
+    while frontier and remaining:
+        frontier, _ = expand_level(frontier, parents, seen_movies, {})
+        remaining.difference_update(frontier)
+
+    paths = {}
+    for target in targets:
+        if target not in parents or source not in people:
+            paths[target] = None
+            continue
+        path = []
+        person_id = target
+        while parents[person_id] is not None:
+            movie_id, previous = parents[person_id]
+            path.append((movie_id, person_id))
+            person_id = previous
+        path.reverse()
+        paths[target] = path
+    return paths
+
+
+def person_id_for_name(name, interactive=True):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    Unless interactive, never asks: ambiguous names resolve to the person
+    with the most movies, and misspelled names to the closest match.
     """
+    if not interactive:
+        return name_index.resolve(name, person_movie_count)
+
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
         return None
@@ -160,6 +429,13 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def person_movie_count(person_id):
+    """
+    Returns the number of movies a person starred in.
+    """
+    return len(people[person_id]["movies"])
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
@@ -0,0 +1,668 @@
+"""
+Compact integer-indexed graph for the degrees data set
+
+People and movies are interned to dense integers, and the bipartite
+person <-> movie adjacency is stored in compressed sparse row (CSR) arrays:
+the movies of person p are person_movies[person_offsets[p]:person_offsets[p + 1]]
+and the stars of movie m are movie_stars[movie_offsets[m]:movie_offsets[m + 1]].
+"""
+
+import csv
+from array import array
+
+from nameindex import NameIndex
+from snapshot import read_snapshot, source_key, write_snapshot
+
+# Distance stored for people that cannot be reached at all
+UNREACHABLE = 255
+
+
+class CompactGraph():
+    """
+    Read-only person <-> movie graph backed by flat integer arrays
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_stars):
+
+        # String tables, indexed by the dense person / movie integers
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+
+        # CSR adjacency, viewed through memoryviews so slicing never copies
+        self.person_offsets = memoryview(person_offsets)
+        self.person_movies = memoryview(person_movies)
+        self.movie_offsets = memoryview(movie_offsets)
+        self.movie_stars = memoryview(movie_stars)
+
+        # Lookup dicts are only built when first needed
+        self._person_index = None
+        self._movie_index = None
+        self._name_index = None
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Builds a graph from people.csv, movies.csv and stars.csv in directory.
+        """
+        person_ids, person_names, person_births = [], [], []
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                person_ids.append(row["id"])
+                person_names.append(row["name"])
+                person_births.append(row["birth"])
+
+        movie_ids, movie_titles, movie_years = [], [], []
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                movie_ids.append(row["id"])
+                movie_titles.append(row["title"])
+                movie_years.append(row["year"])
+
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        edge_people = array("i")
+        edge_movies = array("i")
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                person = person_index.get(row["person_id"])
+                movie = movie_index.get(row["movie_id"])
+                # Skip stars that refer to unknown people or movies, like load_data
+                if person is None or movie is None:
+                    continue
+                edge_people.append(person)
+                edge_movies.append(movie)
+
+        return cls(person_ids, person_names, person_births,
+                   movie_ids, movie_titles, movie_years,
+                   *build_csr(len(person_ids), len(movie_ids), edge_people, edge_movies))
+
+    @classmethod
+    def from_dicts(cls, people, movies):
+        """
+        Builds a graph from the people and movies dicts filled by degrees.load_data.
+        """
+        person_ids = list(people)
+        movie_ids = list(movies)
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        edge_people = array("i")
+        edge_movies = array("i")
+        for person, person_id in enumerate(person_ids):
+            for movie_id in people[person_id]["movies"]:
+                movie = movie_index.get(movie_id)
+                # load_csv keeps stars of movies missing from movies.csv
+                # on the person, so skip them like from_csv does
+                if movie is None:
+                    continue
+                edge_people.append(person)
+                edge_movies.append(movie)
+
+        return cls(person_ids,
+                   [people[person_id]["name"] for person_id in person_ids],
+                   [people[person_id]["birth"] for person_id in person_ids],
+                   movie_ids,
+                   [movies[movie_id]["title"] for movie_id in movie_ids],
+                   [movies[movie_id]["year"] for movie_id in movie_ids],
+                   *build_csr(len(person_ids), len(movie_ids), edge_people, edge_movies))
+
+    def appended_csv(self, directory):
+        """
+        Returns the graph with the rows of delta CSV files in directory
+        added, like appended. Any of people.csv, movies.csv and stars.csv
+        may be missing.
+        """
+        return self.appended(
+            ((row["id"], row["name"], row["birth"]) for row in read_rows(f"{directory}/people.csv")),
+            ((row["id"], row["title"], row["year"]) for row in read_rows(f"{directory}/movies.csv")),
+            ((row["person_id"], row["movie_id"]) for row in read_rows(f"{directory}/stars.csv"))
+        )
+
+    def appended(self, people, movies, stars):
+        """
+        Returns (graph, touched): a new graph with (id, name, birth) people,
+        (id, title, year) movies and (person_id, movie_id) stars added, and
+        the set of person integers whose co-stars changed, the stars of
+        every movie that gained a star. Rows for ids already in the graph,
+        or stars of unknown ids, are skipped.
+
+        This graph is left as it is, so it can keep answering queries while
+        the new one is built, except that a name index already built is
+        shared with the new graph and gains the new names.
+        """
+        self.person_index(None)
+        self.movie_index(None)
+        person_index = dict(self._person_index)
+        movie_index = dict(self._movie_index)
+        person_ids, person_names, person_births = (
+            list(self.person_ids), list(self.person_names), list(self.person_births)
+        )
+        movie_ids, movie_titles, movie_years = (
+            list(self.movie_ids), list(self.movie_titles), list(self.movie_years)
+        )
+        person_count, movie_count = self.person_count, self.movie_count
+
+        added_people = []
+        for person_id, name, birth in people:
+            if person_id in person_index:
+                continue
+            person_index[person_id] = len(person_ids)
+            person_ids.append(person_id)
+            person_names.append(name)
+            person_births.append(birth)
+            added_people.append((name, person_id))
+
+        for movie_id, title, year in movies:
+            if movie_id in movie_index:
+                continue
+            movie_index[movie_id] = len(movie_ids)
+            movie_ids.append(movie_id)
+            movie_titles.append(title)
+            movie_years.append(year)
+
+        # New edges by person and by movie; only these rows are rebuilt
+        new_movies = {}
+        new_stars = {}
+        for person_id, movie_id in stars:
+            person = person_index.get(person_id)
+            movie = movie_index.get(movie_id)
+            if person is None or movie is None:
+                continue
+            if person < person_count and movie < movie_count and movie in self.movies_of(person):
+                continue
+            new_movies.setdefault(person, set()).add(movie)
+            new_stars.setdefault(movie, set()).add(person)
+
+        graph = CompactGraph(
+            person_ids, person_names, person_births,
+            movie_ids, movie_titles, movie_years,
+            *merge_rows(self.person_offsets, self.person_movies, new_movies, len(person_ids)),
+            *merge_rows(self.movie_offsets, self.movie_stars, new_stars, len(movie_ids))
+        )
+        graph._person_index = person_index
+        graph._movie_index = movie_index
+        if self._name_index is not None:
+            for name, person_id in added_people:
+                self._name_index.add(name, person_id)
+            graph._name_index = self._name_index
+
+        touched = set()
+        for movie in new_stars:
+            touched.update(graph.stars_of(movie))
+        return graph, touched
+
+    @property
+    def person_count(self):
+        return len(self.person_offsets) - 1
+
+    @property
+    def movie_count(self):
+        return len(self.movie_offsets) - 1
+
+    def person_index(self, person_id):
+        """
+        Returns the dense integer for person_id, or None if unknown.
+        """
+        if self._person_index is None:
+            self._person_index = {
+                person_id: i for i, person_id in enumerate(self.person_ids)
+            }
+        return self._person_index.get(person_id)
+
+    def movie_index(self, movie_id):
+        """
+        Returns the dense integer for movie_id, or None if unknown.
+        """
+        if self._movie_index is None:
+            self._movie_index = {
+                movie_id: i for i, movie_id in enumerate(self.movie_ids)
+            }
+        return self._movie_index.get(movie_id)
+
+    def movies_of(self, person):
+        """
+        Returns the movie integers of person, without copying.
+        """
+        return self.person_movies[self.person_offsets[person]:self.person_offsets[person + 1]]
+
+    def stars_of(self, movie):
+        """
+        Returns the person integers starring in movie, without copying.
+        """
+        return self.movie_stars[self.movie_offsets[movie]:self.movie_offsets[movie + 1]]
+
+    def person_name(self, person_id):
+        return self.person_names[self.person_index(person_id)]
+
+    def movie_title(self, movie_id):
+        return self.movie_titles[self.movie_index(movie_id)]
+
+    @property
+    def name_index(self):
+        """
+        NameIndex over every person's name, built on first use.
+        """
+        if self._name_index is None:
+            names = {}
+            for person_id, person_name in zip(self.person_ids, self.person_names):
+                names.setdefault(person_name.lower(), set()).add(person_id)
+            self._name_index = NameIndex(names)
+        return self._name_index
+
+    def person_movie_count(self, person_id):
+        """
+        Returns the number of movies a person starred in.
+        """
+        person = self.person_index(person_id)
+        return self.person_offsets[person + 1] - self.person_offsets[person]
+
+    def ids_for_name(self, name):
+        """
+        Returns the set of person_ids whose lowercase name is name.
+        """
+        return set(self.name_index.exact(name))
+
+    def person_id_for_name(self, name, interactive=True):
+        """
+        Returns the IMDB id for a person's name,
+        resolving ambiguities as needed.
+
+        Unless interactive, never asks: ambiguous names resolve to the person
+        with the most movies, and misspelled names to the closest match.
+        """
+        if not interactive:
+            return self.name_index.resolve(name, self.person_movie_count)
+
+        person_ids = list(self.ids_for_name(name))
+        if len(person_ids) == 0:
+            return None
+        elif len(person_ids) > 1:
+            print(f"Which '{name}'?")
+            for person_id in person_ids:
+                person = self.person_index(person_id)
+                name = self.person_names[person]
+                birth = self.person_births[person]
+                print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
+            try:
+                person_id = input("Intended Person ID: ")
+                if person_id in person_ids:
+                    return person_id
+            except ValueError:
+                pass
+            return None
+        else:
+            return person_ids[0]
+
+    def neighbors_for_person(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        neighbors = set()
+        for movie in self.movies_of(self.person_index(person_id)):
+            for person in self.stars_of(movie):
+                neighbors.add((self.movie_ids[movie], self.person_ids[person]))
+        return neighbors
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target.
+
+        If no possible path, or either person_id is unknown, returns None.
+        """
+        path = self.search(self.person_index(source), self.person_index(target))
+        if path is None:
+            return None
+        return [(self.movie_ids[movie], self.person_ids[person]) for movie, person in path]
+
+    def search(self, source, target, bound=None):
+        """
+        Bidirectional BFS between two person integers, returning the
+        shortest list of (movie, person) integer pairs or None.
+
+        bound, if given, prunes the search: before each level it is called
+        as bound(forward, depth), for the side growing and the depth its
+        new people are at, and returns keep(person), false for people that
+        cannot be on a shortest path, or None to keep everyone.
+
+        Unknown people, given as None, are not connected to anyone.
+        """
+        if source is None or target is None:
+            return None
+        if source == target:
+            return []
+
+        # Parent pointers: person -> previous person and the movie they share
+        forward_people = {source: -1}
+        forward_movies = {}
+        backward_people = {target: -1}
+        backward_movies = {}
+
+        # One flag per movie and side, so every cast is read once per side
+        forward_seen = bytearray(self.movie_count)
+        backward_seen = bytearray(self.movie_count)
+
+        forward_frontier = [source]
+        backward_frontier = [target]
+        forward_depth = backward_depth = 0
+        keep = None
+
+        while forward_frontier and backward_frontier:
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_depth += 1
+                if bound is not None:
+                    keep = bound(True, forward_depth)
+                forward_frontier, meeting = self._expand_level(
+                    forward_frontier, forward_people, forward_movies,
+                    forward_seen, backward_people, keep
+                )
+            else:
+                backward_depth += 1
+                if bound is not None:
+                    keep = bound(False, backward_depth)
+                backward_frontier, meeting = self._expand_level(
+                    backward_frontier, backward_people, backward_movies,
+                    backward_seen, forward_people, keep
+                )
+            if meeting is not None:
+                break
+        else:
+            return None
+
+        # Walk back from the meeting person to the source, then reverse
+        path = []
+        person = meeting
+        while forward_people[person] != -1:
+            path.append((forward_movies[person], person))
+            person = forward_people[person]
+        path.reverse()
+
+        # Walk forward from the meeting person to the target
+        person = meeting
+        while backward_people[person] != -1:
+            movie = backward_movies[person]
+            person = backward_people[person]
+            path.append((movie, person))
+        return path
+
+    def paths_from(self, source, targets):
+        """
+        Returns a dict mapping every person_id in targets to the shortest
+        list of (movie_id, person_id) pairs from source, or None if not
+        connected, using a single BFS from source.
+        """
+        source = self.person_index(source)
+        wanted = {}
+        for target in targets:
+            wanted[target] = None if source is None else self.person_index(target)
+
+        indices = {target for target in wanted.values() if target is not None}
+        parent_people, parent_movies = self.search_from(source, indices)
+
+        paths = {}
+        for target_id, target in wanted.items():
+            if target is None or target not in parent_people:
+                paths[target_id] = None
+                continue
+            path = []
+            person = target
+            while parent_people[person] != -1:
+                path.append((self.movie_ids[parent_movies[person]], self.person_ids[person]))
+                person = parent_people[person]
+            path.reverse()
+            paths[target_id] = path
+        return paths
+
+    def search_from(self, source, targets):
+        """
+        BFS from a person integer until every person in targets is reached,
+        or the component is exhausted. Returns the parent people and parent
+        movies dicts of every person reached.
+        """
+        parent_people = {}
+        parent_movies = {}
+        if source is None:
+            return parent_people, parent_movies
+        parent_people[source] = -1
+
+        remaining = set(targets)
+        remaining.discard(source)
+        seen = bytearray(self.movie_count)
+        frontier = [source]
+        while frontier and remaining:
+            frontier, _ = self._expand_level(frontier, parent_people, parent_movies, seen, {})
+            remaining.difference_update(frontier)
+        return parent_people, parent_movies
+
+    def distances(self, sources, limit=UNREACHABLE - 1):
+        """
+        Returns a bytearray with the degrees of separation from the nearest
+        of the person integers in sources to every person, or UNREACHABLE
+        if not connected or farther than limit.
+        """
+        distances = bytearray([UNREACHABLE]) * self.person_count
+        frontier = list(sources)
+        for source in frontier:
+            distances[source] = 0
+        seen = bytearray(self.movie_count)
+        person_offsets, person_movies = self.person_offsets, self.person_movies
+        movie_offsets, movie_stars = self.movie_offsets, self.movie_stars
+
+        depth = 0
+        while frontier and depth < min(limit, UNREACHABLE - 1):
+            depth += 1
+            next_frontier = []
+            for person in frontier:
+                for k in range(person_offsets[person], person_offsets[person + 1]):
+                    movie = person_movies[k]
+                    if seen[movie]:
+                        continue
+                    seen[movie] = 1
+                    for n in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                        neighbor = movie_stars[n]
+                        if distances[neighbor] == UNREACHABLE:
+                            distances[neighbor] = depth
+                            next_frontier.append(neighbor)
+            frontier = next_frontier
+        return distances
+
+    def components(self):
+        """
+        Returns an array with the component number of every person and a
+        list of (size, movie count, first person) for every component.
+
+        Each component is found by a level-synchronous BFS, and every movie
+        belongs to exactly one component, so the whole pass reads each edge once.
+        """
+        person_offsets, person_movies = self.person_offsets, self.person_movies
+        movie_offsets, movie_stars = self.movie_offsets, self.movie_stars
+        labels = array("i", [-1]) * self.person_count
+        seen = bytearray(self.movie_count)
+        sizes = []
+
+        for start in range(self.person_count):
+            if labels[start] != -1:
+                continue
+            component = len(sizes)
+            labels[start] = component
+            size, movie_count = 1, 0
+            frontier = [start]
+            while frontier:
+                next_frontier = []
+                for person in frontier:
+                    for k in range(person_offsets[person], person_offsets[person + 1]):
+                        movie = person_movies[k]
+                        if seen[movie]:
+                            continue
+                        seen[movie] = 1
+                        movie_count += 1
+                        for n in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                            neighbor = movie_stars[n]
+                            if labels[neighbor] == -1:
+                                labels[neighbor] = component
+                                next_frontier.append(neighbor)
+                size += len(next_frontier)
+                frontier = next_frontier
+            sizes.append((size, movie_count, start))
+        return labels, sizes
+
+    def _expand_level(self, frontier, parent_people, parent_movies, seen, other_people, keep=None):
+        """
+        Expands every person in frontier by one step, skipping new people
+        for whom keep, if given, is false. Returns the next frontier and
+        a person reached by both searches, or None.
+        """
+        person_offsets, person_movies = self.person_offsets, self.person_movies
+        movie_offsets, movie_stars = self.movie_offsets, self.movie_stars
+
+        next_frontier = []
+        meeting = None
+        meeting_distance = None
+        for person in frontier:
+            for k in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[k]
+                if seen[movie]:
+                    continue
+                seen[movie] = 1
+                for n in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    neighbor = movie_stars[n]
+                    if neighbor in parent_people:
+                        continue
+                    if keep is not None and not keep(neighbor):
+                        continue
+                    parent_people[neighbor] = person
+                    parent_movies[neighbor] = movie
+                    next_frontier.append(neighbor)
+                    if neighbor in other_people:
+                        # Keep the meeting closest to the other side's root
+                        distance = 0
+                        step = neighbor
+                        while other_people[step] != -1:
+                            step = other_people[step]
+                            distance += 1
+                        if meeting is None or distance < meeting_distance:
+                            meeting = neighbor
+                            meeting_distance = distance
+        return next_frontier, meeting
+
+
+def build_csr(person_count, movie_count, edge_people, edge_movies):
+    """
+    Builds deduplicated CSR arrays from parallel arrays of (person, movie) edges.
+
+    Returns person_offsets, person_movies, movie_offsets, movie_stars.
+    """
+    # Counting sort of the edges by person
+    offsets = array("i", bytes(4 * (person_count + 1)))
+    for person in edge_people:
+        offsets[person + 1] += 1
+    for person in range(person_count):
+        offsets[person + 1] += offsets[person]
+    grouped = array("i", bytes(4 * len(edge_movies)))
+    cursor = array("i", offsets)
+    for person, movie in zip(edge_people, edge_movies):
+        grouped[cursor[person]] = movie
+        cursor[person] += 1
+
+    # Drop repeated stars rows, which load_data's sets would also ignore
+    person_offsets = array("i", [0])
+    person_movies = array("i")
+    for person in range(person_count):
+        person_movies.extend(sorted(set(grouped[offsets[person]:offsets[person + 1]])))
+        person_offsets.append(len(person_movies))
+    del grouped, cursor
+
+    # Counting sort again by movie to get the reverse direction
+    movie_offsets = array("i", bytes(4 * (movie_count + 1)))
+    for movie in person_movies:
+        movie_offsets[movie + 1] += 1
+    for movie in range(movie_count):
+        movie_offsets[movie + 1] += movie_offsets[movie]
+    movie_stars = array("i", bytes(4 * len(person_movies)))
+    cursor = array("i", movie_offsets)
+    for person in range(person_count):
+        for k in range(person_offsets[person], person_offsets[person + 1]):
+            movie = person_movies[k]
+            movie_stars[cursor[movie]] = person
+            cursor[movie] += 1
+
+    return person_offsets, person_movies, movie_offsets, movie_stars
+
+
+def merge_rows(offsets, values, additions, count):
+    """
+    Returns new CSR offsets and values with count rows, adding to each row
+    the values in additions, a dict from row to a set of values. Rows past
+    the old ones start out empty. Only rows with additions are rebuilt;
+    the runs of unchanged rows between them are copied as blocks.
+    """
+    old_count = len(offsets) - 1
+    new_offsets = array("i", [0])
+    new_values = array("i")
+    done = 0
+    for row in sorted(additions) + [count]:
+        # Unchanged old rows before this one keep their values, shifted along
+        end = min(row, old_count)
+        if done < end:
+            shift = len(new_values) - offsets[done]
+            new_values.frombytes(values[offsets[done]:offsets[end]].cast("B"))
+            new_offsets.extend(offset + shift for offset in offsets[done + 1:end + 1])
+            done = end
+
+        # New rows without additions are empty
+        new_offsets.extend(array("i", [len(new_values)]) * (row - done))
+        if row == count:
+            break
+
+        row_values = set(additions[row])
+        if row < old_count:
+            row_values.update(values[offsets[row]:offsets[row + 1]])
+        new_values.extend(sorted(row_values))
+        new_offsets.append(len(new_values))
+        done = row + 1
+    return new_offsets, new_values
+
+
+def read_rows(filename):
+    """
+    Yields the rows of a CSV file as dicts, or nothing if it does not exist.
+    """
+    try:
+        f = open(filename, encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with f:
+        yield from csv.DictReader(f)
+
+
+def load_compact(directory, snapshot=True):
+    """
+    Load data from CSV files into a CompactGraph.
+
+    With snapshot, a fresh snapshot next to the CSVs is memory-mapped
+    instead, and a missing or stale one is rewritten after parsing.
+    """
+    key = None
+    if snapshot:
+        try:
+            # Taken before parsing, so edits made meanwhile leave the snapshot stale
+            key = source_key(directory)
+        except OSError:
+            pass
+        columns = read_snapshot(directory)
+        if columns is not None:
+            return CompactGraph(**columns)
+
+    graph = CompactGraph.from_csv(directory)
+    if key is not None:
+        try:
+            write_snapshot(graph, directory, key)
+        except OSError:
+            # A read-only data directory just means every start is cold
+            pass
+    return graph
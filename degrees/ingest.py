@@ -0,0 +1,38 @@
+"""
+Ingest delta CSVs into a running degrees server
+
+The delta directory holds new rows in the same people.csv, movies.csv
+and stars.csv format as the data set; any of the three may be missing.
+"""
+
+import json
+import os
+import socket
+import sys
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python ingest.py port|socket_path delta_directory")
+    address, directory = sys.argv[1], os.path.abspath(sys.argv[2])
+
+    if address.isdigit():
+        connection = socket.create_connection(("127.0.0.1", int(address)))
+    else:
+        connection = socket.socket(socket.AF_UNIX)
+        connection.connect(address)
+
+    with connection, connection.makefile("rw", encoding="utf-8") as stream:
+        stream.write(json.dumps({"op": "ingest", "directory": directory}) + "\n")
+        stream.flush()
+        response = json.loads(stream.readline())
+
+    if not response["ok"]:
+        sys.exit(f"Ingest failed: {response['error']}")
+    print(f"Ingested {directory}: {response['touched']} people touched, "
+          f"{response['invalidated']} cached paths dropped.")
+    print(f"Graph now has {response['people']} people and {response['movies']} movies.")
+
+
+if __name__ == "__main__":
+    main()
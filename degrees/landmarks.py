@@ -0,0 +1,322 @@
+"""
+Landmark distance oracle for the degrees data set
+
+A few landmark people are chosen, and the degrees of separation from each
+of them to everyone else are stored. By the triangle inequality, for any
+landmark L the separation d(s, t) of two people satisfies
+
+    |d(L, s) - d(L, t)| <= d(s, t) <= d(L, s) + d(L, t)
+
+so k landmarks give lower and upper bounds in O(k), and the lower bound
+is an admissible A* heuristic for the exact search (the ALT technique).
+"""
+
+import heapq
+import math
+import struct
+from array import array
+
+from graph import UNREACHABLE
+
+LANDMARKS_NAME = "degrees.landmarks"
+LANDMARKS_MAGIC = b"LANDMARK"
+LANDMARKS_VERSION = 1
+
+# magic, version, landmark count, person count, movie count
+HEADER = struct.Struct("<8sIIQQ")
+
+LANDMARK_COUNT = 16
+
+# Smallest component other than the largest that gets a landmark of its own
+MIN_COMPONENT = 1000
+
+# Maps UNREACHABLE to 0 in a bytearray of distances, leaving the rest alone
+OUTSIDE = bytes(range(UNREACHABLE)) + bytes([0])
+
+
+class LandmarkOracle():
+    """
+    Precomputed distances from a few landmarks to every person
+    """
+
+    def __init__(self, graph, landmarks, distances):
+        self.graph = graph
+        self.landmarks = landmarks
+        self.distances = distances
+
+        # Largest finite distance from each landmark, to know when
+        # its bound cannot possibly prune anyone
+        self.eccentricities = [
+            max((d for d in set(distances) if d != UNREACHABLE), default=0)
+            for distances in distances
+        ]
+
+    @classmethod
+    def build(cls, graph, k=LANDMARK_COUNT, min_component=MIN_COMPONENT):
+        """
+        Chooses up to k landmarks. Every component but the largest with at
+        least min_component people gets one, its person with the most
+        movies, since a landmark only bounds people in its own component.
+        The rest go to the largest component by farthest-point selection:
+        the first is its person with the most movies, and each next one is
+        the person in it farthest from every landmark chosen so far.
+        """
+        if graph.person_count == 0 or k < 1:
+            return cls(graph, array("i"), [])
+        labels, sizes = graph.components()
+
+        # Person with the most movies in each component
+        offsets = graph.person_offsets
+        hubs = [person for _, _, person in sizes]
+        for person in range(graph.person_count):
+            label = labels[person]
+            if offsets[person + 1] - offsets[person] > offsets[hubs[label] + 1] - offsets[hubs[label]]:
+                hubs[label] = person
+
+        order = sorted(range(len(sizes)), key=lambda c: -sizes[c][0])
+        main = order[0]
+        others = [hubs[c] for c in order[1:k] if sizes[c][0] >= min_component]
+
+        landmarks = array("i", [hubs[main]])
+        distances = [graph.distances([hubs[main]])]
+
+        # Distance from every person in the largest component to its nearest
+        # landmark so far, and 0 for everyone else so they are never picked
+        nearest = distances[0].translate(OUTSIDE)
+        while len(landmarks) < k - len(others):
+            candidate = max(range(graph.person_count), key=nearest.__getitem__)
+            if nearest[candidate] == 0:
+                break
+            landmarks.append(candidate)
+            distances.append(graph.distances([candidate]))
+            nearest = bytearray(map(min, nearest, distances[-1]))
+
+        for hub in others:
+            landmarks.append(hub)
+            distances.append(graph.distances([hub]))
+        return cls(graph, landmarks, distances)
+
+    @classmethod
+    def load(cls, graph, path):
+        """
+        Reads an oracle saved for graph, or returns None if the file is
+        missing, corrupt, or was built for a different data set.
+        """
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            magic, version, k, person_count, movie_count = HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return None
+        if magic != LANDMARKS_MAGIC or version != LANDMARKS_VERSION:
+            return None
+        if person_count != graph.person_count or movie_count != graph.movie_count:
+            return None
+        if len(data) != HEADER.size + 4 * k + k * person_count:
+            return None
+
+        landmarks = array("i")
+        landmarks.frombytes(data[HEADER.size:HEADER.size + 4 * k])
+        position = HEADER.size + 4 * k
+        distances = []
+        for _ in range(k):
+            distances.append(bytearray(data[position:position + person_count]))
+            position += person_count
+        return cls(graph, landmarks, distances)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(LANDMARKS_MAGIC, LANDMARKS_VERSION, len(self.landmarks),
+                                self.graph.person_count, self.graph.movie_count))
+            f.write(self.landmarks.tobytes())
+            for distances in self.distances:
+                f.write(distances)
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees of separation between
+        two person_ids. Both are math.inf if the oracle proves they are not
+        connected, and upper is None if no landmark reaches either of them.
+        """
+        return self.index_bounds(self.graph.person_index(source), self.graph.person_index(target))
+
+    def index_bounds(self, source, target):
+        """
+        Returns (lower, upper) like bounds, for two person integers.
+        """
+        if source == target:
+            return 0, 0
+        lower, upper = 1, None
+        for distances in self.distances:
+            a, b = distances[source], distances[target]
+            if a == UNREACHABLE and b == UNREACHABLE:
+                continue
+            if a == UNREACHABLE or b == UNREACHABLE:
+                # One of them shares a component with the landmark, the other does not
+                return math.inf, math.inf
+            lower = max(lower, abs(a - b))
+            if upper is None or a + b < upper:
+                upper = a + b
+        return lower, upper
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, searching only people
+        whose landmark bounds allow them on a shortest path.
+
+        If no possible path, returns None.
+        """
+        graph = self.graph
+        path = self.search(graph.person_index(source), graph.person_index(target))
+        if path is None:
+            return None
+        return [(graph.movie_ids[movie], graph.person_ids[person]) for movie, person in path]
+
+    def search(self, source, target):
+        """
+        Bidirectional BFS between two person integers, CompactGraph.search
+        pruned with the landmark bounds.
+
+        A person first reached at depth g from one end can only lie on a
+        shortest path if g plus its lower bound to the other end is at most
+        the upper bound, so everyone else is never expanded.
+        """
+        if source is None or target is None:
+            return None
+        lower, upper = self.index_bounds(source, target)
+        if lower == math.inf:
+            return None
+        if upper is None:
+            # No landmark reaches this component, so there is nothing to prune with
+            return self.graph.search(source, target)
+        if source == target:
+            return []
+
+        # Anchors towards the other end of each side's search, and the
+        # people each side has ruled out; a person ruled out at one depth
+        # is ruled out at every deeper one too
+        anchors = {True: self.anchors(target), False: self.anchors(source)}
+        pruned = {True: set(), False: set()}
+
+        def bound(forward, depth):
+            # Only landmarks whose bound can exceed the slack left at this
+            # depth can prune anyone, and shallow levels often have none at all
+            useful = [(distances, anchor) for distances, anchor, reach in anchors[forward]
+                      if depth + reach > upper]
+            if not useful:
+                return None
+            ruled_out = pruned[forward]
+
+            def keep(person):
+                if person in ruled_out:
+                    return False
+                # Lower bound from person to the other end of the search
+                lower = 0
+                for distances, anchor in useful:
+                    distance = distances[person]
+                    if distance != UNREACHABLE:
+                        lower = max(lower, abs(distance - anchor))
+                if depth + lower > upper:
+                    ruled_out.add(person)
+                    return False
+                return True
+
+            return keep
+
+        return self.graph.search(source, target, bound)
+
+    def anchors(self, person):
+        """
+        Returns (distances, distance from the landmark to person, largest
+        bound it can give) for every landmark that reaches person, for
+        computing bounds towards it.
+        """
+        anchors = []
+        for distances, eccentricity in zip(self.distances, self.eccentricities):
+            anchor = distances[person]
+            if anchor != UNREACHABLE:
+                anchors.append((distances, anchor, max(anchor, eccentricity - anchor)))
+        return anchors
+
+    def astar(self, source, target):
+        """
+        A* search between two person integers with the landmark lower
+        bound as heuristic, returning the shortest list of (movie, person)
+        integer pairs or None.
+        """
+        if source is None or target is None:
+            return None
+        lower, upper = self.index_bounds(source, target)
+        if lower == math.inf:
+            return None
+        if upper is None:
+            upper = math.inf
+
+        graph = self.graph
+        person_offsets, person_movies = graph.person_offsets, graph.person_movies
+        movie_offsets, movie_stars = graph.movie_offsets, graph.movie_stars
+        anchors = [(distances, anchor) for distances, anchor, _ in self.anchors(target)]
+
+        # Best known distance, parent person and parent movie of each person
+        cost = {source: 0}
+        parent_people = {source: -1}
+        parent_movies = {}
+        # Cost at which each movie's cast was last scanned
+        movie_cost = {}
+
+        # Ties on f are broken towards deeper people, closer to the target
+        queue = [(lower, 0, source)]
+        while queue:
+            _, negative_cost, person = heapq.heappop(queue)
+            g = -negative_cost
+            if g != cost[person]:
+                continue
+            if person == target:
+                break
+            for k in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[k]
+                if movie_cost.get(movie, g + 1) <= g:
+                    continue
+                movie_cost[movie] = g
+                for n in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    neighbor = movie_stars[n]
+                    if cost.get(neighbor, g + 2) <= g + 1:
+                        continue
+                    bound = 0
+                    for distances, anchor in anchors:
+                        distance = distances[neighbor]
+                        if distance != UNREACHABLE:
+                            bound = max(bound, abs(distance - anchor))
+                    f = g + 1 + bound
+                    if f > upper:
+                        continue
+                    cost[neighbor] = g + 1
+                    parent_people[neighbor] = person
+                    parent_movies[neighbor] = movie
+                    heapq.heappush(queue, (f, -(g + 1), neighbor))
+        else:
+            return None
+
+        path = []
+        person = target
+        while parent_people[person] != -1:
+            path.append((parent_movies[person], person))
+            person = parent_people[person]
+        path.reverse()
+        return path
+
+
+def load_oracle(graph, path, k=LANDMARK_COUNT):
+    """
+    Returns the oracle saved at path for graph, building and saving
+    a new one if there is none yet.
+    """
+    oracle = LandmarkOracle.load(graph, path)
+    if oracle is None:
+        oracle = LandmarkOracle.build(graph, k)
+        try:
+            oracle.save(path)
+        except OSError:
+            pass
+    return oracle
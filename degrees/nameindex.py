@@ -0,0 +1,182 @@
+"""
+Name search index for the degrees data set
+
+Supports exact, prefix and typo-tolerant lookups of people by name.
+Names are compared in lowercase. Prefix search binary-searches a sorted
+list of names, and fuzzy search gathers candidates from a trigram
+inverted index, or for short names from the names of similar length,
+and only checks the edit distance of those sharing enough trigrams.
+"""
+
+from array import array
+from bisect import bisect_left, insort
+
+# Padding so the first and last letters also start and end trigrams
+PAD = "\0"
+
+
+class NameIndex():
+    """
+    Index from lowercase names to the person_ids that have them
+    """
+
+    def __init__(self, names):
+        """
+        Builds the index from a dict mapping lowercase names
+        to sets of person_ids, like degrees.names.
+        """
+        # Every distinct name gets a stable entry number, in insertion order
+        self.names = []
+        self.ids = []
+        self.positions = {}
+
+        # Names in alphabetical order, for prefix search
+        self.sorted_names = []
+
+        # Maps each trigram to the entries of the names containing it
+        self.grams = {}
+
+        # Maps each name length to the entries of the names that long
+        self.lengths = {}
+
+        # Number of distinct trigrams in each entry's name
+        self.gram_counts = array("H")
+
+        for name in sorted(names):
+            self._add_name(name, sorted(names[name]))
+
+    def add(self, name, person_id):
+        """
+        Adds one person_id under name, keeping the index searchable.
+        """
+        name = name.lower()
+        i = self.positions.get(name)
+        if i is None:
+            self._add_name(name, [person_id])
+        elif person_id not in self.ids[i]:
+            self.ids[i].append(person_id)
+
+    def _add_name(self, name, person_ids):
+        """
+        Adds a new entry for a lowercase name not yet in the index.
+        """
+        i = len(self.names)
+        self.names.append(name)
+        self.ids.append(person_ids)
+        self.positions[name] = i
+        if not self.sorted_names or name > self.sorted_names[-1]:
+            self.sorted_names.append(name)
+        else:
+            insort(self.sorted_names, name)
+        grams = set(trigrams(name))
+        self.gram_counts.append(min(len(grams), 0xFFFF))
+        for gram in grams:
+            postings = self.grams.get(gram)
+            if postings is None:
+                postings = self.grams[gram] = array("i")
+            postings.append(i)
+        bucket = self.lengths.get(len(name))
+        if bucket is None:
+            bucket = self.lengths[len(name)] = array("i")
+        bucket.append(i)
+
+    def exact(self, name):
+        """
+        Returns the person_ids whose name is exactly name, ignoring case.
+        """
+        i = self.positions.get(name.lower())
+        return [] if i is None else list(self.ids[i])
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to limit (name, person_ids) pairs whose name starts
+        with prefix, in alphabetical order.
+        """
+        prefix = prefix.lower()
+        matches = []
+        i = bisect_left(self.sorted_names, prefix)
+        while (i < len(self.sorted_names) and len(matches) < limit
+               and self.sorted_names[i].startswith(prefix)):
+            name = self.sorted_names[i]
+            matches.append((name, list(self.ids[self.positions[name]])))
+            i += 1
+        return matches
+
+    def fuzzy(self, name, limit=10, max_distance=2):
+        """
+        Returns up to limit (name, person_ids, distance) triples whose
+        name is within max_distance edits of name, closest first.
+        """
+        name = name.lower()
+        gram_set = set(trigrams(name))
+        grams = sorted(gram_set, key=lambda gram: len(self.grams.get(gram, ())))
+
+        # One edit changes at most three trigrams, so any match within
+        # max_distance shares at least one of the 3 * max_distance + 1
+        # rarest trigrams of name; short names have fewer than that, so
+        # only names of a length within max_distance are tried instead
+        needed = 3 * max_distance + 1
+        if len(grams) < needed:
+            candidates = []
+            for length in range(len(name) - max_distance, len(name) + max_distance + 1):
+                candidates.extend(self.lengths.get(length, ()))
+        else:
+            candidates = set()
+            for gram in grams[:needed]:
+                candidates.update(self.grams.get(gram, ()))
+
+        # For the same reason a match keeps all but 3 * max_distance of the
+        # distinct trigrams of either name
+        matches = []
+        for i in candidates:
+            candidate = self.names[i]
+            if abs(len(candidate) - len(name)) > max_distance:
+                continue
+            overlap = max(len(gram_set), self.gram_counts[i]) - 3 * max_distance
+            if overlap > 0 and len(gram_set.intersection(trigrams(candidate))) < overlap:
+                continue
+            distance = edit_distance(name, candidate, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, candidate, i))
+        matches.sort()
+        return [(candidate, list(self.ids[i]), distance)
+                for distance, candidate, i in matches[:limit]]
+
+    def resolve(self, name, weight, fuzzy=True):
+        """
+        Returns the single best person_id for name without asking,
+        or None. Exact matches win over fuzzy ones, and people sharing
+        a name are ranked by weight(person_id), highest first.
+        """
+        person_ids = self.exact(name)
+        if not person_ids and fuzzy:
+            matches = self.fuzzy(name, limit=1)
+            if matches:
+                person_ids = matches[0][1]
+        if not person_ids:
+            return None
+        return max(person_ids, key=lambda person_id: (weight(person_id), person_id))
+
+
+def trigrams(name):
+    """
+    Returns the list of padded trigrams of name.
+    """
+    padded = f"{PAD}{PAD}{name}{PAD}"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def edit_distance(a, b, limit):
+    """
+    Returns the Levenshtein distance between a and b,
+    or limit + 1 as soon as it is known to exceed limit.
+    """
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i]
+        for j, y in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
@@ -0,0 +1,425 @@
+"""
+Persistent degrees query server
+
+Loads the graph once and answers newline-delimited JSON requests over
+a TCP or Unix socket. Each request is an object with an "op" key and
+gets exactly one JSON object back, echoing the request's "id" if given:
+
+    {"op": "lookup", "name": "Kevin Bacon"}
+    {"op": "resolve", "name": "kevn bacon"}
+    {"op": "prefix", "prefix": "kevin b", "limit": 10}
+    {"op": "fuzzy", "name": "kevn bacon", "limit": 10}
+    {"op": "path", "source": "102", "target": "158"}
+    {"op": "bounds", "source": "102", "target": "158"}
+    {"op": "ingest", "directory": "/data/delta"}
+    {"op": "stats"}
+
+Searches run in a process pool so the event loop keeps serving other
+clients, and path results are kept in an LRU cache. Ingesting delta CSVs
+swaps in an updated graph and only drops the cached paths it may shorten.
+"""
+
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import worker
+from graph import UNREACHABLE, load_compact
+from landmarks import LANDMARKS_NAME, LandmarkOracle
+from snapshot import SNAPSHOT_NAME, write_snapshot_file
+
+CACHE_SIZE = 100000
+
+# Latency samples kept per op for the percentiles reported by "stats"
+LATENCY_SAMPLES = 10000
+
+# Snapshot of the graph with ingested deltas, for restarted workers.
+# It is not keyed on the CSVs, so it never replaces degrees.snapshot.
+LIVE_SNAPSHOT_NAME = f"{SNAPSHOT_NAME}.live"
+
+
+def search(source, target):
+    """
+    Runs one shortest path query in a worker process.
+    """
+    return worker.graph.shortest_path(source, target)
+
+
+class LRUCache():
+    """
+    Mapping that forgets the least recently used key once full
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+class Latency():
+    """
+    Request count and recent latency samples for one op
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.samples.append(seconds)
+
+    def summary(self):
+        samples = sorted(self.samples)
+
+        def percentile(p):
+            if not samples:
+                return None
+            return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else None,
+            "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99),
+            "max_ms": samples[-1] * 1000 if samples else None,
+        }
+
+
+class DegreesServer():
+    """
+    Answers lookup and path requests against one warm graph
+    """
+
+    def __init__(self, directory, workers=None, cache_size=CACHE_SIZE):
+        self.directory = directory
+        self.workers = workers
+        self.graph = load_compact(directory)
+        # Build the lazy id and name dicts now rather than on the first request
+        self.graph.person_index(None)
+        self.graph.name_index
+
+        # Saved by "python benchmark.py oracle", answers "bounds" without a search
+        self.oracle = LandmarkOracle.load(self.graph, os.path.join(directory, LANDMARKS_NAME))
+        self.pool = ProcessPoolExecutor(workers, initializer=worker.init_worker, initargs=(directory,))
+        self.pool_args = (directory,)
+        self.cache = LRUCache(cache_size)
+
+        # Bumped by every ingest, so searches started before it are not cached
+        self.generation = 0
+
+        # Searches already running, so identical concurrent queries share one
+        self.pending = {}
+        self.ingest_lock = asyncio.Lock()
+        self.latency = {}
+
+    async def handle_client(self, reader, writer):
+        """
+        Serves one connection, one JSON request per line.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.handle_line(line)
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_line(self, line):
+        """
+        Returns the response object for one request line.
+        """
+        start = time.perf_counter()
+        request = {}
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            op = request.get("op")
+            handler = getattr(self, f"op_{op}", None) if isinstance(op, str) else None
+            if handler is None:
+                raise ValueError(f"unknown op: {op!r}")
+            response = await handler(request)
+            response["ok"] = True
+        except (ValueError, KeyError, TypeError, OSError, BrokenProcessPool) as e:
+            op = "error"
+            if not isinstance(request, dict):
+                request = {}
+            response = {"ok": False, "error": str(e)}
+        if "id" in request:
+            response["id"] = request["id"]
+        self.latency.setdefault(op, Latency()).add(time.perf_counter() - start)
+        return response
+
+    async def op_lookup(self, request):
+        """
+        Returns every person_id with the requested name.
+        """
+        name = request["name"]
+        person_ids = sorted(self.graph.ids_for_name(name))
+        return {"person_ids": person_ids}
+
+    async def op_resolve(self, request):
+        """
+        Returns the single best person_id for a name, without asking.
+
+        Misspelled names need a fuzzy search, so this runs in a thread.
+        """
+        loop = asyncio.get_running_loop()
+        person_id = await loop.run_in_executor(
+            None, self.graph.person_id_for_name, request["name"], False
+        )
+        return {"person_id": person_id}
+
+    async def op_prefix(self, request):
+        """
+        Returns the names, with their person_ids, starting with a prefix.
+        """
+        matches = self.graph.name_index.prefix(request["prefix"], int(request.get("limit", 10)))
+        return {"matches": [{"name": name, "person_ids": ids} for name, ids in matches]}
+
+    async def op_fuzzy(self, request):
+        """
+        Returns the names, with their person_ids, closest to a misspelled name.
+
+        Runs in a thread, so a slow search does not hold up other requests.
+        """
+        loop = asyncio.get_running_loop()
+        matches = await loop.run_in_executor(
+            None, self.graph.name_index.fuzzy, request["name"], int(request.get("limit", 10))
+        )
+        return {"matches": [
+            {"name": name, "person_ids": ids, "distance": distance}
+            for name, ids, distance in matches
+        ]}
+
+    async def op_path(self, request):
+        """
+        Returns the shortest path between two person_ids.
+        """
+        source, target = request["source"], request["target"]
+        for person_id in (source, target):
+            if self.graph.person_index(person_id) is None:
+                raise ValueError(f"unknown person_id: {person_id!r}")
+        path = await self.shortest_path(source, target)
+        return {
+            "degrees": None if path is None else len(path),
+            "path": path
+        }
+
+    async def op_bounds(self, request):
+        """
+        Returns landmark lower and upper bounds on the degrees of separation,
+        with null for unknown and -1 for provably not connected.
+        """
+        if self.oracle is None:
+            raise ValueError("no landmark oracle was saved for this data set")
+        source, target = request["source"], request["target"]
+        for person_id in (source, target):
+            if self.graph.person_index(person_id) is None:
+                raise ValueError(f"unknown person_id: {person_id!r}")
+        lower, upper = self.oracle.bounds(source, target)
+        if lower == math.inf:
+            lower = upper = -1
+        return {"lower": lower, "upper": upper}
+
+    async def op_ingest(self, request):
+        """
+        Adds the rows of delta CSVs in a directory to the graph, restarts
+        the workers on the updated graph and drops affected cached paths.
+
+        The updated graph is built and saved in a thread while requests are
+        still answered from the old one, then swapped in between requests.
+        Ingests run one at a time, each on top of the last.
+        """
+        loop = asyncio.get_running_loop()
+        async with self.ingest_lock:
+            graph, touched = await loop.run_in_executor(
+                None, self.graph.appended_csv, request["directory"]
+            )
+            live_snapshot = os.path.join(self.directory, LIVE_SNAPSHOT_NAME)
+            await loop.run_in_executor(None, write_snapshot_file, graph, live_snapshot)
+
+            self.graph = graph
+            self.generation += 1
+
+            # New edges can make landmark lower bounds too high
+            self.oracle = None
+
+            old_pool = self.pool
+            self.pool_args = (self.directory, live_snapshot)
+            self.pool = ProcessPoolExecutor(
+                self.workers, initializer=worker.init_worker, initargs=self.pool_args
+            )
+            # Searches already running finish on the old workers
+            old_pool.shutdown(wait=False)
+
+            invalidated = await self.invalidate(graph, touched)
+        return {
+            "touched": len(touched),
+            "invalidated": invalidated,
+            "people": graph.person_count,
+            "movies": graph.movie_count,
+        }
+
+    async def op_stats(self, request):
+        """
+        Returns cache counters and per-op latency summaries.
+        """
+        return {
+            "cache": {
+                "size": len(self.cache),
+                "hits": self.cache.hits,
+                "misses": self.cache.misses,
+            },
+            "latency": {op: latency.summary() for op, latency in self.latency.items()}
+        }
+
+    async def shortest_path(self, source, target):
+        """
+        Returns the cached path between source and target, or runs
+        the search in the process pool.
+        """
+        key = (source, target)
+        if key in self.cache:
+            return self.cache.get(key)
+        self.cache.misses += 1
+
+        future = self.pending.get(key)
+        if future is None:
+            generation = self.generation
+            future = asyncio.ensure_future(self.run_search(source, target))
+            self.pending[key] = future
+            try:
+                path = await future
+            finally:
+                if self.pending.get(key) is future:
+                    del self.pending[key]
+            if generation == self.generation:
+                self.cache.put(key, path)
+            return path
+        return await future
+
+    async def run_search(self, source, target):
+        """
+        Runs one search in the process pool. If a worker died and broke
+        the pool, starts a new one and tries once more.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self.pool
+        try:
+            return await loop.run_in_executor(pool, search, source, target)
+        except BrokenProcessPool:
+            # Concurrent searches on the same broken pool restart it only once
+            if self.pool is pool:
+                self.pool = ProcessPoolExecutor(
+                    self.workers, initializer=worker.init_worker, initargs=self.pool_args
+                )
+                pool.shutdown(wait=False)
+            return await loop.run_in_executor(self.pool, search, source, target)
+
+    async def invalidate(self, graph, touched):
+        """
+        Drops cached paths that new edges of graph between the touched
+        people may have shortened, and returns how many were dropped.
+
+        A new path shorter than a cached one of length d must reach some
+        touched person from the source in at most d - 2 steps before using
+        its first new edge, so paths whose source is farther than that from
+        every touched person are still shortest. Cached "not connected"
+        results are dropped if the source reaches anyone touched at all.
+        """
+        entries = list(self.cache.entries.items())
+        if not touched or not entries:
+            return 0
+        limit = -1
+        for _, path in entries:
+            limit = max(limit, UNREACHABLE - 1 if path is None else len(path) - 2)
+        if limit < 0:
+            return 0
+
+        # Paths cached while the distances are found come from graph already,
+        # and at worst are dropped again below
+        loop = asyncio.get_running_loop()
+        distances = await loop.run_in_executor(None, graph.distances, touched, limit)
+        invalidated = 0
+        for (source, target), path in entries:
+            distance = distances[graph.person_index(source)]
+            if distance == UNREACHABLE:
+                continue
+            if path is None or distance <= len(path) - 2:
+                if (source, target) in self.cache.entries:
+                    del self.cache.entries[(source, target)]
+                    invalidated += 1
+        return invalidated
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+async def serve(server, address):
+    """
+    Serves server on address, a port number or a Unix socket path.
+    """
+    if isinstance(address, int):
+        listener = await asyncio.start_server(server.handle_client, "127.0.0.1", address)
+    else:
+        listener = await asyncio.start_unix_server(server.handle_client, address)
+    print(f"Serving on {address}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python server.py directory port|socket_path")
+    directory = sys.argv[1]
+    address = int(sys.argv[2]) if sys.argv[2].isdigit() else sys.argv[2]
+
+    print("Loading data...")
+    server = DegreesServer(directory, os.cpu_count())
+    print("Data loaded.")
+    try:
+        asyncio.run(serve(server, address))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
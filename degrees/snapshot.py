@@ -0,0 +1,198 @@
+"""
+Binary snapshot cache for the degrees data set
+
+A snapshot stores the columns of a CompactGraph next to the CSV files
+it was built from. It is keyed on the size and mtime of people.csv,
+movies.csv and stars.csv, so editing any of them makes the snapshot stale.
+Reading a snapshot memory-maps the file, and the graph arrays are views
+straight into it.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+SNAPSHOT_NAME = "degrees.snapshot"
+SNAPSHOT_MAGIC = b"DEGREES\0"
+SNAPSHOT_VERSION = 1
+
+SOURCE_FILES = ("people.csv", "movies.csv", "stars.csv")
+
+# magic, version, byte order, crc32 of the payload, payload length,
+# then (size, mtime_ns) of every source file, padded so the payload
+# starts 8-byte aligned
+HEADER = struct.Struct("<8sIBxxxIQ" + "QQ" * len(SOURCE_FILES) + "4x")
+
+# Order of the sections in the payload, each prefixed by its byte length
+STRING_COLUMNS = ("person_ids", "person_names", "person_births",
+                  "movie_ids", "movie_titles", "movie_years")
+ARRAY_COLUMNS = ("person_offsets", "person_movies", "movie_offsets", "movie_stars")
+
+SECTION = struct.Struct("<Q")
+ALIGNMENT = 8
+
+
+class StringTable():
+    """
+    Read-only sequence of strings stored as one UTF-8 blob plus offsets
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError("string table index out of range")
+        if i < 0:
+            i += len(self)
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def snapshot_path(directory):
+    return os.path.join(directory, SNAPSHOT_NAME)
+
+
+def source_key(directory):
+    """
+    Returns the (size, mtime_ns) of every source CSV, flattened.
+    """
+    key = []
+    for name in SOURCE_FILES:
+        stat = os.stat(os.path.join(directory, name))
+        key.extend((stat.st_size, stat.st_mtime_ns))
+    return key
+
+
+def write_snapshot(graph, directory, key):
+    """
+    Writes graph to a snapshot next to the CSVs in directory, keyed on
+    key, the source_key taken before the CSVs were read: if one changed
+    while it was being parsed, the snapshot is then already stale instead
+    of passing for the new contents.
+    """
+    write_snapshot_file(graph, snapshot_path(directory), key)
+
+
+def write_snapshot_file(graph, path, key=None):
+    """
+    Writes graph to a snapshot at path, keyed on key (a list of
+    (size, mtime_ns) pairs, flattened), or on nothing at all.
+
+    The file is written under a temporary name and then renamed,
+    so a reader never sees a half-written snapshot.
+    """
+    if key is None:
+        key = [0] * (2 * len(SOURCE_FILES))
+    sections = []
+    for column in STRING_COLUMNS:
+        offsets, blob = encode_strings(getattr(graph, column))
+        sections.extend((offsets.tobytes(), blob))
+    for column in ARRAY_COLUMNS:
+        sections.append(getattr(graph, column).tobytes())
+
+    payload = bytearray()
+    for section in sections:
+        payload += SECTION.pack(len(section))
+        payload += section
+        payload += bytes(-len(payload) % ALIGNMENT)
+
+    header = HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sys.byteorder == "little",
+        zlib.crc32(payload), len(payload), *key
+    )
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(temporary, path)
+
+
+def read_snapshot(directory):
+    """
+    Returns the CompactGraph columns stored in the snapshot in directory,
+    as a dict of keyword arguments, or None if there is no snapshot
+    or it is stale or corrupt.
+    """
+    try:
+        key = source_key(directory)
+    except OSError:
+        return None
+    return read_snapshot_file(snapshot_path(directory), key)
+
+
+def read_snapshot_file(path, key=None):
+    """
+    Returns the CompactGraph columns stored in the snapshot at path, like
+    read_snapshot, checking that it was keyed on key if one is given.
+    """
+    try:
+        with open(path, "rb") as f:
+            snapshot = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        return decode_snapshot(snapshot, key)
+    except (struct.error, ValueError, TypeError, IndexError):
+        return None
+
+
+def decode_snapshot(snapshot, key):
+    """
+    Decodes a mapped snapshot, returning None if it does not match key.
+    """
+    if len(snapshot) < HEADER.size:
+        return None
+    magic, version, little, crc, length, *stored_key = HEADER.unpack_from(snapshot)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        return None
+    if little != (sys.byteorder == "little") or (key is not None and stored_key != key):
+        return None
+    if len(snapshot) != HEADER.size + length:
+        return None
+
+    view = memoryview(snapshot)[HEADER.size:]
+    if zlib.crc32(view) != crc:
+        view.release()
+        return None
+
+    sections = []
+    position = 0
+    for _ in range(2 * len(STRING_COLUMNS) + len(ARRAY_COLUMNS)):
+        size, = SECTION.unpack_from(view, position)
+        position += SECTION.size
+        sections.append(view[position:position + size])
+        position += size + (-(position + size) % ALIGNMENT)
+
+    columns = {}
+    for i, column in enumerate(STRING_COLUMNS):
+        offsets, blob = sections[2 * i], sections[2 * i + 1]
+        columns[column] = StringTable(offsets.cast("q"), blob)
+    for i, column in enumerate(ARRAY_COLUMNS):
+        columns[column] = sections[2 * len(STRING_COLUMNS) + i].cast("i")
+
+    # The views keep the mapping alive for as long as the graph uses them
+    return columns
+
+
+def encode_strings(strings):
+    """
+    Returns the offsets array and UTF-8 blob for a sequence of strings.
+    """
+    offsets = array("q", [0])
+    blob = bytearray()
+    for string in strings:
+        blob += string.encode("utf-8")
+        offsets.append(len(blob))
+    return offsets, bytes(blob)
@@ -0,0 +1,191 @@
+import os
+import random
+import tempfile
+import unittest
+from array import array
+
+import degrees
+import snapshot
+from graph import UNREACHABLE, CompactGraph, build_csr, load_compact
+from landmarks import LandmarkOracle
+
+PEOPLE = """id,name,birth
+1,Kevin Bacon,1958
+2,Tom Hanks,1956
+3,Sally Field,1946
+"""
+
+MOVIES = """id,title,year
+10,Apollo 13,1995
+11,Forrest Gump,1994
+"""
+
+# The last row stars a known person in a movie missing from movies.csv
+STARS = """person_id,movie_id
+1,10
+2,10
+2,11
+3,11
+3,99
+"""
+
+
+class ColdLoadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        for name, contents in (("people.csv", PEOPLE), ("movies.csv", MOVIES), ("stars.csv", STARS)):
+            with open(os.path.join(self.directory.name, name), "w", encoding="utf-8") as f:
+                f.write(contents)
+        for table in (degrees.names, degrees.people, degrees.movies):
+            table.clear()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_dangling_star_row(self):
+        degrees.load_data(self.directory.name)
+        self.assertEqual(degrees.people["3"]["movies"], {"11", "99"})
+        self.assertEqual(len(degrees.shortest_path("1", "3")), 2)
+
+        # The snapshot written on the cold start leaves the dangling movie out
+        self.assertTrue(os.path.exists(snapshot.snapshot_path(self.directory.name)))
+        graph = load_compact(self.directory.name)
+        self.assertEqual(len(graph.shortest_path("1", "3")), 2)
+
+    def test_snapshot_keyed_before_parsing(self):
+        load_csv = degrees.load_csv
+
+        def load_then_edit(directory):
+            load_csv(directory)
+            with open(os.path.join(directory, "people.csv"), "a", encoding="utf-8") as f:
+                f.write("4,Meg Ryan,1961\n")
+
+        degrees.load_csv = load_then_edit
+        try:
+            degrees.load_data(self.directory.name)
+        finally:
+            degrees.load_csv = load_csv
+
+        # Edited while being parsed, so the snapshot must not pass for the new CSVs
+        self.assertIsNone(snapshot.read_snapshot(self.directory.name))
+
+
+class IngestTest(unittest.TestCase):
+
+    def test_appended_matches_cold_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, contents in (("people.csv", PEOPLE), ("movies.csv", MOVIES), ("stars.csv", STARS)):
+                with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+                    f.write(contents)
+            graph = CompactGraph.from_csv(directory)
+            before = bytes(graph.movie_stars)
+
+            updated, touched = graph.appended(
+                [("4", "Meg Ryan", "1961")],
+                [("12", "Sleepless in Seattle", "1993")],
+                [("2", "12"), ("4", "12"), ("4", "10"), ("1", "10"), ("5", "10")]
+            )
+            with open(os.path.join(directory, "people.csv"), "a", encoding="utf-8") as f:
+                f.write("4,Meg Ryan,1961\n")
+            with open(os.path.join(directory, "movies.csv"), "a", encoding="utf-8") as f:
+                f.write("12,Sleepless in Seattle,1993\n")
+            with open(os.path.join(directory, "stars.csv"), "a", encoding="utf-8") as f:
+                f.write("2,12\n4,12\n4,10\n")
+            cold = CompactGraph.from_csv(directory)
+
+        for column in ("person_offsets", "person_movies", "movie_offsets", "movie_stars"):
+            self.assertEqual(bytes(getattr(updated, column)), bytes(getattr(cold, column)))
+        self.assertEqual(bytes(graph.movie_stars), before)
+        self.assertEqual(touched, {0, 1, 3})
+        self.assertEqual(len(updated.shortest_path("4", "3")), 2)
+
+
+class ShortestPathTest(unittest.TestCase):
+
+    def test_unknown_people(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, contents in (("people.csv", PEOPLE), ("movies.csv", MOVIES), ("stars.csv", STARS)):
+                with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+                    f.write(contents)
+            graph = CompactGraph.from_csv(directory)
+
+        self.assertIsNone(graph.shortest_path("404", "405"))
+        self.assertIsNone(graph.shortest_path("1", "404"))
+        self.assertIsNone(graph.shortest_path("404", "1"))
+        self.assertEqual(graph.shortest_path("1", "1"), [])
+
+
+def grid_graph(side, islands):
+    """
+    Returns a graph of a side x side grid of people, with one movie per
+    pair of neighbours, plus islands pairs of people sharing a movie, and
+    a chain of four people sharing a movie per link.
+    """
+    edge_people, edge_movies = array("i"), array("i")
+    movie_count = 0
+
+    def link(a, b):
+        nonlocal movie_count
+        edge_people.extend([a, b])
+        edge_movies.extend([movie_count, movie_count])
+        movie_count += 1
+
+    for i in range(side):
+        for j in range(side):
+            if j + 1 < side:
+                link(i * side + j, i * side + j + 1)
+            if i + 1 < side:
+                link(i * side + j, (i + 1) * side + j)
+    person_count = side * side
+    for _ in range(islands):
+        link(person_count, person_count + 1)
+        person_count += 2
+    for n in range(3):
+        link(person_count + n, person_count + n + 1)
+    person_count += 4
+
+    person_ids = [str(person) for person in range(person_count)]
+    movie_ids = [f"m{movie}" for movie in range(movie_count)]
+    return CompactGraph(person_ids, person_ids, [""] * person_count,
+                        movie_ids, movie_ids, [""] * movie_count,
+                        *build_csr(person_count, movie_count, edge_people, edge_movies))
+
+
+class LandmarkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.side = 15
+        self.graph = grid_graph(self.side, 30)
+
+    def test_landmarks_stay_in_large_components(self):
+        oracle = LandmarkOracle.build(self.graph, 8)
+        self.assertEqual(len(oracle.landmarks), 8)
+        self.assertTrue(all(person < self.side * self.side for person in oracle.landmarks))
+
+        # A small component only gets a landmark once it counts as large, and only one
+        oracle = LandmarkOracle.build(self.graph, 8, min_component=4)
+        outside = [person for person in oracle.landmarks if person >= self.side * self.side]
+        self.assertEqual(len(outside), 1)
+        self.assertGreaterEqual(outside[0], self.graph.person_count - 4)
+
+    def test_more_landmarks_tighten_bounds(self):
+        rng = random.Random(0)
+        people = self.side * self.side
+        pairs = [(rng.randrange(people), rng.randrange(people)) for _ in range(200)]
+        gaps = []
+        for k in (1, 8):
+            oracle = LandmarkOracle.build(self.graph, k)
+            gap = 0
+            for source, target in pairs:
+                lower, upper = oracle.index_bounds(source, target)
+                distance = self.graph.distances([source])[target]
+                self.assertNotEqual(distance, UNREACHABLE)
+                self.assertTrue(lower <= distance <= upper)
+                gap += upper - lower
+            gaps.append(gap)
+        self.assertLess(gaps[1], gaps[0] / 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+"""
+Worker processes for the degrees process pools
+
+batch.py, server.py and analytics.py all spread their searches over a
+process pool whose workers load the graph once, with init_worker as the
+pool's initializer, and then search it through the graph global.
+"""
+
+from graph import CompactGraph, load_compact
+from snapshot import read_snapshot_file
+
+# Graph loaded once per worker process
+graph = None
+
+
+def init_worker(directory, live_snapshot=None):
+    """
+    Loads the graph in a worker process. With a snapshot this only maps
+    the file, so every worker shares the same pages. live_snapshot, if
+    given, is a snapshot of the graph with ingested deltas to map instead;
+    if it cannot be read, the worker falls back to the data set without
+    them rather than failing to start.
+    """
+    global graph
+    columns = None if live_snapshot is None else read_snapshot_file(live_snapshot)
+    if columns is None:
+        graph = load_compact(directory)
+    else:
+        graph = CompactGraph(**columns)
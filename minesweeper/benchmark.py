@@ -0,0 +1,74 @@
+import random
+import sys
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+# (height, width) of the boards the latency benchmark plays on, with the
+# mine density of the 30x16 expert board
+LATENCY_SIZES = [(8, 8), (16, 30), (100, 100), (316, 316), (1000, 1000)]
+LATENCY_DENSITY = 99 / 480
+LATENCY_MOVES = 5000
+LATENCY_SEED = 0
+
+
+def percentile(values, fraction):
+    """
+    Returns the value below which fraction of the sorted values lie.
+    """
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def benchmark_latency():
+    """
+    Plays the AI on growing boards, reporting how long creating the board
+    takes and how long each add_knowledge and each guess takes. A mine hit
+    is treated as flagged instead of ending the game, so every board gets
+    LATENCY_MOVES moves.
+    """
+    for height, width in LATENCY_SIZES:
+        random.seed(LATENCY_SEED)
+        mines = round(height * width * LATENCY_DENSITY)
+        start = time.perf_counter()
+        game = Minesweeper(height, width, mines)
+        ai = MinesweeperAI(height, width, mines)
+        created = time.perf_counter() - start
+
+        updates, guesses = [], []
+        for _ in range(min(LATENCY_MOVES, height * width - mines)):
+            move = ai.make_safe_move()
+            if move is None:
+                start = time.perf_counter()
+                move = ai.make_random_move()
+                guesses.append(time.perf_counter() - start)
+                if move is None:
+                    break
+            start = time.perf_counter()
+            if game.is_mine(move):
+                ai.mark_mine(move)
+                ai.infer()
+            else:
+                ai.add_knowledge(move, game.nearby_mines(move))
+            updates.append(time.perf_counter() - start)
+
+        updates.sort()
+        guesses.sort()
+        print(f"{height}x{width}, {mines} mines: created in {created * 1000:.1f}ms, "
+              f"{len(updates)} moves, add_knowledge p50 {percentile(updates, 0.5) * 1e6:.0f}us "
+              f"p99 {percentile(updates, 0.99) * 1e6:.0f}us max {updates[-1] * 1000:.1f}ms, "
+              f"{len(guesses)} guesses, slowest {guesses[-1] * 1000:.1f}ms")
+
+
+BENCHMARKS = {
+    "latency": benchmark_latency,
+}
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] not in BENCHMARKS:
+        sys.exit(f"Usage: python benchmark.py {'|'.join(BENCHMARKS)}")
+    BENCHMARKS[sys.argv[1]]()
+
+
+if __name__ == "__main__":
+    main()
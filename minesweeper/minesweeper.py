@@ -1,10 +1,43 @@
 import itertools
 import random
+from collections import deque
+
+import probability
+
+
+def neighbor_counts(board, height, width):
+    """
+    Returns the number of mines next to every cell of board, a bytearray
+    holding 1 for each mine by flat index i * width + j.
+
+    The counts are one convolution of the board with the 3x3 neighbourhood,
+    done as whole-board integer arithmetic: reading the board as one large
+    integer with a byte per cell, shifting it one byte moves every cell
+    one column and shifting it width bytes moves every row, so adding up
+    the shifted copies adds up each cell's neighbours. No count can go
+    above 8, so no byte ever carries into the next.
+    """
+    size = height * width
+    cells = int.from_bytes(board, "little")
+
+    # Cells that have a neighbour to their right, and to their left
+    not_last = int.from_bytes(bytes([1] * (width - 1) + [0]) * height, "little")
+    not_first = int.from_bytes(bytes([0] + [1] * (width - 1)) * height, "little")
+
+    # Each cell plus its left and right neighbours, then plus the rows above and below
+    rows = cells + ((cells & not_last) << 8) + ((cells & not_first) >> 8)
+    total = rows + (rows << 8 * width) + (rows >> 8 * width) - cells
+    total &= (1 << 8 * size) - 1
+    return bytearray(total.to_bytes(size, "little"))
 
 
 class Minesweeper():
     """
     Minesweeper game representation
+
+    Cells are numbered by flat index i * width + j, and the board and the
+    mine counts next to each cell are bytearrays holding a byte per cell,
+    so even a 1000x1000 board takes a couple of megabytes.
     """
 
     def __init__(self, height=8, width=8, mines=8):
@@ -15,20 +48,18 @@ class Minesweeper():
         self.mines = set()
 
         # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        self.board = bytearray(height * width)
 
         # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        for index in random.sample(range(height * width), mines):
+            self.mines.add(divmod(index, width))
+            self.board[index] = 1
+
+        # Count the mines next to every cell once, instead of on every reveal
+        self.counts = neighbor_counts(self.board, height, width)
+
+        # Cells revealed so far, so a flood fill never reveals one twice
+        self.revealed = bytearray(height * width)
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -41,7 +72,7 @@ class Minesweeper():
         for i in range(self.height):
             print("--" * self.width + "-")
             for j in range(self.width):
-                if self.board[i][j]:
+                if self.board[i * self.width + j]:
                     print("|X", end="")
                 else:
                     print("| ", end="")
@@ -50,7 +81,7 @@ class Minesweeper():
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return bool(self.board[i * self.width + j])
 
     def nearby_mines(self, cell):
         """
@@ -58,24 +89,41 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
+        i, j = cell
+        return self.counts[i * self.width + j]
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
+    def reveal(self, cell):
+        """
+        Reveals a cell that is not a mine. If no mines are next to it, its
+        neighbours are revealed too, and so on through the whole connected
+        region of such cells and its border, breadth first.
 
-        return count
+        Returns a list of (cell, nearby mines) for every cell newly
+        revealed, starting with cell itself.
+        """
+        width = self.width
+        start = cell[0] * width + cell[1]
+        if self.revealed[start]:
+            return []
+        self.revealed[start] = 1
+        revealed = []
+        queue = deque([start])
+        while queue:
+            index = queue.popleft()
+            row, col = divmod(index, width)
+            count = self.counts[index]
+            revealed.append(((row, col), count))
+            if count:
+                continue
+
+            # with no mines around, every neighbour is safe to reveal
+            for i in range(max(row - 1, 0), min(row + 2, self.height)):
+                for j in range(max(col - 1, 0), min(col + 2, width)):
+                    neighbor = i * width + j
+                    if not self.revealed[neighbor]:
+                        self.revealed[neighbor] = 1
+                        queue.append(neighbor)
+        return revealed
 
     def won(self):
         """
@@ -142,67 +190,203 @@ class Sentence():
 class MinesweeperAI():
     """
     Minesweeper game player
+
+    Inside the AI, cells are flat indices i * width + j, and which cells
+    have been moved on, are safe or are mines is kept in bytearrays with a
+    byte per cell, so checking or marking a cell takes constant time
+    however large the board. The public methods take and return (i, j)
+tuples, like the game; the underscored helpers take flat indices.
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None):
 
         # Set initial height and width
         self.height = height
         self.width = width
+        self.size = height * width
+
+        # Number of mines on the board, if known, for weighing up guesses;
+        # otherwise the density of the default 8x8 board with 8 mines is assumed
+        self.total_mines = mines if mines is not None else round(height * width / 8)
 
         # Keep track of which cells have been clicked on
-        self.moves_made = set()
+        self.moves_made = bytearray(self.size)
 
         # Keep track of cells known to be safe or mines
-        self.mines = set()
-        self.safes = set()
+        self.mines = bytearray(self.size)
+        self.safes = bytearray(self.size)
+
+        # Safe cells to move on next; some may have been moved on since
+        self.pending = []
+
+        # Sentences about the game known to be true, keyed by their cells,
+        # so the same cells never appear in two sentences
+        self.knowledge = {}
+
+        # Maps each cell to the keys of the sentences that contain it
+        self.containing = {}
+
+        # Keys of sentences added or changed since inference last looked at them
+        self.dirty = set()
+
+    def index(self, cell):
+        """
+        Returns the flat index of an (i, j) cell.
+        """
+        i, j = cell
+        return i * self.width + j
+
+    def cell(self, index):
+        """
+        Returns the (i, j) cell of a flat index.
+        """
+        return divmod(index, self.width)
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+    def cells(self, flags):
+        """
+        Returns the set of (i, j) cells set in one of the flag arrays,
+        such as self.mines.
+        """
+        return {self.cell(index) for index, flag in enumerate(flags) if flag}
 
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
-        self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self._mark_mine(self.index(cell))
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
-        self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        self._mark_safe(self.index(cell))
 
-    def neighbors_cell(self, cell):
-        neighbors_cell = set()
-        row, col = cell
-        count_mines = 0
+    def _mark_mine(self, cell):
+        """
+        Like mark_mine, for a cell given by flat index.
+        """
+        self.mines[cell] = 1
+        for sentence in self.remove_containing(cell):
+            sentence.mark_mine(cell)
+            self.add_sentence(sentence.cells, sentence.count)
 
-        # looping over the row (before) and the (current) row and the row (after) [the current cell]
-        for i in range(row - 1, row + 2):
-            # looping over the coulmn (before) and the (current) coulmn and the coulmn (after) [the current cell]
-            for j in range(col - 1, col + 2):
+    def _mark_safe(self, cell):
+        """
+        Like mark_safe, for a cell given by flat index.
+        """
+        if not self.safes[cell]:
+            self.safes[cell] = 1
+            if not self.moves_made[cell]:
+                self.pending.append(cell)
+        for sentence in self.remove_containing(cell):
+            sentence.mark_safe(cell)
+            self.add_sentence(sentence.cells, sentence.count)
 
-                # ignore the cell it self
-                if (i, j) == cell:
-                    continue
+    def add_sentence(self, cells, count):
+        """
+        Adds the sentence that count of cells are mines to the knowledge,
+        leaving out cells already known, unless it says nothing new.
+        """
+        mines, safes = self.mines, self.safes
+        unknown = set()
+        for cell in cells:
+            if mines[cell]:
+                count -= 1
+            elif not safes[cell]:
+                unknown.add(cell)
+
+        # an empty sentence says nothing, and a repeated one nothing new
+        key = frozenset(unknown)
+        if not key or key in self.knowledge:
+            return
+        self.knowledge[key] = Sentence(unknown, count)
+        for cell in key:
+            self.containing.setdefault(cell, set()).add(key)
+        self.dirty.add(key)
+
+    def remove_sentence(self, key):
+        """
+        Removes the sentence about the cells in key, returning it.
+        """
+        for cell in key:
+            keys = self.containing[cell]
+            keys.discard(key)
+            if not keys:
+                del self.containing[cell]
+        self.dirty.discard(key)
+        return self.knowledge.pop(key)
+
+    def remove_containing(self, cell):
+        """
+        Removes every sentence that contains cell, returning them.
+        """
+        return [self.remove_sentence(key) for key in list(self.containing.get(cell, ()))]
 
-                # check if the current neigbour is a mine .. if it is then increase the count by 1
-                if (i, j) in self.mines:
-                    count_mines += 1
+    def infer(self):
+        """
+        Draws every conclusion that follows from the changed sentences,
+        marking cells as safe or mines and adding the sentences that follow
+        from one sentence holding a subset of another's cells. Each change
+        only revisits the sentences sharing a cell with it.
+        """
+        while self.dirty:
+            key = self.dirty.pop()
+            sentence = self.knowledge[key]
+
+            if sentence.count == 0:
+                for cell in list(key):
+                    self._mark_safe(cell)
+                continue
+            if sentence.count == len(key):
+                for cell in list(key):
+                    self._mark_mine(cell)
+                continue
+
+            # only sentences sharing a cell can be a subset or superset of this one
+            related = set()
+            for cell in key:
+                related |= self.containing[cell]
+            related.discard(key)
+            for other in related:
+                other_count = self.knowledge[other].count
+                if other < key:
+                    self.add_sentence(key - other, sentence.count - other_count)
+                elif key < other:
+                    self.add_sentence(other - key, other_count - sentence.count)
+
+    def _neighbors(self, cell):
+        """
+        Returns the flat indices of the cells next to a flat index.
+        """
+        row, col = divmod(cell, self.width)
+        return [i * self.width + j
+                for i in range(max(row - 1, 0), min(row + 2, self.height))
+                for j in range(max(col - 1, 0), min(col + 2, self.width))
+                if (i, j) != (row, col)]
 
-                # adding to the neighbors
-                # check if the cell is within bounds
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    # add the neighbor_cell to neighbors_cell if it is not in the (mines or safes) set
-                    if (i, j) not in self.mines and (i, j) not in self.safes:
-                        neighbors_cell.add((i, j))
+    def neighbors_cell(self, cell):
+        """
+        Returns the neighbours of a cell that are not known to be safe
+        or mines, and the number of its neighbours known to be mines.
+        """
+        neighbors_cell, count_mines = self._neighbors_cell(self.index(cell))
+        return {self.cell(neighbor) for neighbor in neighbors_cell}, count_mines
 
+    def _neighbors_cell(self, cell):
+        """
+        Like neighbors_cell, for a cell given by flat index.
+        """
+        neighbors_cell = set()
+        count_mines = 0
+        for neighbor in self._neighbors(cell):
+            # check if the current neigbour is a mine .. if it is then increase the count by 1
+            if self.mines[neighbor]:
+                count_mines += 1
+            # add the neighbor_cell to neighbors_cell if it is not in the (mines or safes)
+            elif not self.safes[neighbor]:
+                neighbors_cell.add(neighbor)
         return neighbors_cell, count_mines
 
     def add_knowledge(self, cell, count):
@@ -210,66 +394,34 @@ class MinesweeperAI():
         Called when the Minesweeper board tells us, for a given
         safe cell, how many neighboring cells have mines in them.
         """
+        self.add_knowledge_batch([(cell, count)])
 
-        # 1) mark the cell as a move that has been made
-        self.moves_made.add(cell)
-
-        # 2) mark the cell as safe
-        self.mark_safe(cell)
-
-        # 3) add a new sentence to the AI's knowledge base
-
-        # getting the neighbors cells of the current cell and the count_mines
-        undetermined_neighbors, count_mines = self.neighbors_cell(cell)
-        new_sentence_cells = set()
-
-        # looping over the undetermined_neighbors and added to the new_sentence_cells
-        for neighbor in undetermined_neighbors:
-            new_sentence_cells.add(neighbor)
-
-        # check if new_sentence_cells has cell inside to avoide error
-        if new_sentence_cells:
-            self.knowledge.append(Sentence(new_sentence_cells, count - count_mines))
-
-            # 4) loop over every sentence in KB and ---
-            # --- mark any additional cells as safe or as mines to infer ---
-            # --- any additional knowledge ( only if we can [mark cell as (mine || safe)])
-
-            inferenced_needed = True
-            while inferenced_needed:
-
-                # setting it to false because to make sure to iterate over every sentence one times---
-                # --- if there is no cell can marked as a (mine or cell)
-                inferenced_needed = False
-
-                for sentence in self.knowledge:
-                    if sentence.known_mines():
-                        for cell in sentence.known_mines().copy():
-                            self.mark_mine(cell)
-                            inferenced_needed = True
-
-                    if sentence.known_safes():
-                        for cell in sentence.known_safes().copy():
-                            self.mark_safe(cell)
-                            inferenced_needed = True
+    def add_knowledge_batch(self, revealed):
+        """
+        Like add_knowledge for every (cell, count) in revealed, such as
+        the cells Minesweeper.reveal opened at once, but drawing
+        conclusions only once, after all of them have been added.
+        """
+        cells = [(self.index(cell), count) for cell, count in revealed]
 
-            # 5) add any new sentences to the AI's knowledge base
-            # if they can be inferred from existing knowledge
-            # Note: this can made by the (subset method)
+        # 1) mark the cells as moves that have been made
+        for cell, _ in cells:
+            self.moves_made[cell] = 1
 
-            # Create a list to store new sentences
-            new_sentences = []
+        # 2) mark the cells as safe, before any sentence mentions them
+        for cell, _ in cells:
+            self._mark_safe(cell)
 
-            for sentence1 in self.knowledge:
-                for sentence2 in self.knowledge:
-                    if sentence1 != sentence2 and sentence1.cells.issubset(sentence2.cells):
-                        new_cells = sentence2.cells - sentence1.cells
-                        new_count = sentence2.count - sentence1.count
-                        infer_sentence = Sentence(new_cells, new_count)
-                        if infer_sentence not in self.knowledge:
-                            new_sentences.append(infer_sentence)
+        # 3) add new sentences to the AI's knowledge base; inside a
+        # revealed region they are mostly empty, and dropped
+        for cell, count in cells:
+            undetermined_neighbors, count_mines = self._neighbors_cell(cell)
+            self.add_sentence(undetermined_neighbors, count - count_mines)
 
-            self.knowledge.extend(new_sentences)
+        # 4) mark any additional cells as safe or as mines, and
+        # 5) add any new sentences that can be inferred, starting only
+        # from the sentences these moves added or changed
+        self.infer()
 
     def make_safe_move(self):
         """
@@ -280,31 +432,58 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        # choose a cell from the safe cells (self.safes)
-        for cell in self.safes:
-            if cell not in self.moves_made:
-                return cell
-         # return none .. if no safe_cell to pick up!
-        return None
+        # dropping safe cells that have been moved on since they were found
+        pending = self.pending
+        while pending and self.moves_made[pending[-1]]:
+            pending.pop()
+        # return none .. if no safe_cell to pick up!
+        if not pending:
+            return None
+        return self.cell(pending[-1])
 
     def make_random_move(self):
         """
         Returns a move to make on the Minesweeper board.
-        Should choose randomly among cells that:
+        Should choose among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+        picking the one least likely to be a mine, and randomly among
+        equally likely ones. Returns None if there is no such cell.
         """
-        # creating a list to append all cells that are valid
-        random_cell = []
-
-        # looping over every cell in the board
-        for row in range(self.height):
-            for col in range(self.width):
-                cell = (row, col)
-                # check if this cell has not been choosen before and not mine
-                if cell not in self.moves_made and cell not in self.mines:
-                    random_cell.append(cell)
+        # a cell known to be safe cannot be beaten
+        move = self.make_safe_move()
+        if move is not None:
+            return move
+        unknown = self.size - self.safes.count(1) - self.mines.count(1)
+        if not unknown:
+            return None
+
+        # weighing up every layout of mines the knowledge allows
+        sentences = [(sentence.cells, sentence.count) for sentence in self.knowledge.values()]
+        mines_left = self.total_mines - self.mines.count(1)
+        chances, others_chance = probability.probabilities(sentences, unknown, mines_left)
+
+        # choose random from the cells that are least likely to be mines,
+        # where every cell no sentence mentions is equally likely
+        others = unknown - len(chances)
+        lowest = min(list(chances.values()) + ([others_chance] if others else []))
+        safest = [cell for cell, chance in chances.items() if chance <= lowest + 1e-9]
+        if others and others_chance <= lowest + 1e-9:
+            choice = random.randrange(len(safest) + others)
+            if choice >= len(safest):
+                return self.cell(self.random_other(chances))
+        return self.cell(random.choice(safest))
+
+    def random_other(self, frontier):
+        """
+        Returns a random unknown cell that is not in frontier.
+        """
+        def unknown(cell):
+            return not (self.safes[cell] or self.mines[cell] or cell in frontier)
 
-        # choose random from the valid cells
-        random_choosen_cell = random.choice(random_cell)
-        return random_choosen_cell
+        # Such cells are usually plentiful, so trying random ones is quickest
+        for _ in range(64):
+            cell = random.randrange(self.size)
+            if unknown(cell):
+                return cell
+        return random.choice([cell for cell in range(self.size) if unknown(cell)])
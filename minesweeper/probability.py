@@ -0,0 +1,241 @@
+"""
+Mine probabilities for Minesweeper guesses
+
+When no cell is known to be safe, the AI guesses the cell least likely to
+be a mine. The sentences in its knowledge only involve the frontier, the
+unknown cells next to revealed ones, and cells that share no sentence
+cannot affect each other, so the frontier is split into independent
+components. Each component's consistent mine layouts are counted by
+backtracking, memoized on what is left to satisfy of the sentences still
+open, giving for every number of mines k the number of layouts with k
+mines and how many of those have a mine in each cell.
+
+Every other unknown cell is equally likely to hold the mines left over,
+so a combination of layouts using K mines in all is weighted by the
+number of ways to place the rest off the frontier, C(others, left - K).
+A component too tangled to count within LIMIT subproblems, or with more
+than CELL_LIMIT cells, falls back to a rough estimate from its sentences
+alone.
+"""
+
+import math
+
+# Memoized subproblems allowed per component before falling back to an estimate
+LIMIT = 20000
+
+# Largest component counted exactly; counting recurses once per cell, so
+# larger ones would run out of stack before LIMIT could stop them
+CELL_LIMIT = 500
+
+
+class TooManyStates(Exception):
+    """
+    Raised when counting a component would take more than LIMIT
+    subproblems, or it has more than CELL_LIMIT cells
+    """
+
+
+def components(sentences):
+    """
+    Splits sentences, given as (cells, count) pairs, into groups
+    that share no cells. Returns a list of (cells, sentences) pairs,
+    with the cells of each in the order they should be counted in.
+    """
+    containing = {}
+    for sentence in sentences:
+        for cell in sentence[0]:
+            containing.setdefault(cell, []).append(sentence)
+
+    groups = []
+    seen = set()
+    for start in containing:
+        if start in seen:
+            continue
+
+        # breadth first, so cells of one sentence stay close together in the order
+        cells, group, included = [], [], set()
+        seen.add(start)
+        frontier = [start]
+        while frontier:
+            cell = frontier.pop(0)
+            cells.append(cell)
+            for sentence in containing[cell]:
+                if id(sentence) not in included:
+                    included.add(id(sentence))
+                    group.append(sentence)
+                for neighbor in sentence[0]:
+                    if neighbor not in seen:
+                        seen.add(neighbor)
+                        frontier.append(neighbor)
+        groups.append((cells, group))
+    return groups
+
+
+def count_layouts(cells, sentences):
+    """
+    Counts the mine layouts of cells that satisfy sentences.
+
+    Returns a dict mapping each possible number of mines k to (ways,
+    mines), where ways is the number of layouts with k mines and mines[n]
+    the number of those with a mine in cells[n]. Raises TooManyStates
+    instead if that would take too long.
+    """
+    size = len(cells)
+    if size > CELL_LIMIT:
+        raise TooManyStates
+    index = {cell: n for n, cell in enumerate(cells)}
+    members = [sorted(index[cell] for cell in sentence_cells) for sentence_cells, _ in sentences]
+    remaining = [count for _, count in sentences]
+
+    # The sentences each cell is in, and for each, how many of its cells come later
+    touching = [[] for _ in range(size)]
+    for number, positions in enumerate(members):
+        for order, position in enumerate(positions):
+            touching[position].append((number, len(positions) - order - 1))
+
+    # Sentences with cells both before and from each position, the only ones
+    # whose remaining count depends on how the earlier cells were filled
+    open_at = []
+    for position in range(size):
+        open_at.append([number for number, positions in enumerate(members)
+                        if positions[0] < position <= positions[-1]])
+
+    memo = {}
+
+    def count(position):
+        if position == size:
+            return {0: (1, [])}
+        key = (position, tuple(remaining[number] for number in open_at[position]))
+        if key in memo:
+            return memo[key]
+        if len(memo) >= LIMIT:
+            raise TooManyStates
+
+        layouts = {}
+        for mine in (0, 1):
+            # Each sentence needs between none and all of its later cells to be mines
+            if any(not 0 <= remaining[number] - mine <= later
+                   for number, later in touching[position]):
+                continue
+            for number, _ in touching[position]:
+                remaining[number] -= mine
+            rest = count(position + 1)
+            for number, _ in touching[position]:
+                remaining[number] += mine
+
+            for k, (ways, mines) in rest.items():
+                total, counts = layouts.get(k + mine, (0, None))
+                if counts is None:
+                    counts = [0] * (size - position)
+                counts[0] += ways * mine
+                for n, value in enumerate(mines, 1):
+                    counts[n] += value
+                layouts[k + mine] = (total + ways, counts)
+        memo[key] = layouts
+        return layouts
+
+    return count(0)
+
+
+def estimate_layouts(cells, sentences):
+    """
+    Returns a rough stand-in for count_layouts, taking each cell to be a
+    mine with the highest density of the sentences it is in, and the
+    component to hold the expected number of mines in one layout.
+    """
+    density = {cell: 0.0 for cell in cells}
+    for sentence_cells, count in sentences:
+        for cell in sentence_cells:
+            density[cell] = max(density[cell], count / len(sentence_cells))
+    expected = round(sum(density.values()))
+    return {expected: (1, [density[cell] for cell in cells])}
+
+
+def convolve(first, second):
+    """
+    Returns the number of ways to place each total of mines in two
+    independent groups, given the ways for each group as dicts.
+    """
+    combined = {}
+    for k1, ways1 in first.items():
+        for k2, ways2 in second.items():
+            combined[k1 + k2] = combined.get(k1 + k2, 0) + ways1 * ways2
+    return combined
+
+
+def log_comb(n, r):
+    """
+    Returns the logarithm of C(n, r), or -inf where it is zero.
+    """
+    if not 0 <= r <= n:
+        return -math.inf
+    return math.lgamma(n + 1) - math.lgamma(r + 1) - math.lgamma(n - r + 1)
+
+
+def probabilities(sentences, unknown, mines_left):
+    """
+    Returns the probability that each cell is a mine, given sentences as
+    (cells, count) pairs, the number of unknown cells and the number of
+    mines among them, as (chances, others) where chances maps every cell
+    in a sentence to its probability, and others is the probability for
+    each unknown cell in no sentence.
+    """
+    groups = []
+    for cells, group in components(sentences):
+        try:
+            layouts = count_layouts(cells, group)
+        except TooManyStates:
+            layouts = estimate_layouts(cells, group)
+
+        # Only ratios matter, and scaled down the counts fit in floats
+        scale = max(ways for ways, _ in layouts.values())
+        layouts = {k: (ways / scale, [count / scale for count in mines])
+                   for k, (ways, mines) in layouts.items()}
+        groups.append((cells, layouts))
+
+    others = unknown - sum(len(cells) for cells, _ in groups)
+
+    # Ways for all components but one, from the products before and after it
+    totals = [{k: ways for k, (ways, _) in layouts.items()} for _, layouts in groups]
+    before = [{0: 1}]
+    for ways in totals:
+        before.append(convolve(before[-1], ways))
+    after = [{0: 1}]
+    for ways in reversed(totals):
+        after.append(convolve(after[-1], ways))
+    after.reverse()
+    everything = before[-1]
+
+    # Ways to place the rest of the mines on cells no sentence mentions, as
+    # logarithms relative to the largest, since on a large board C(others, left)
+    # has hundreds of thousands of digits
+    logs = {k: log_comb(others, mines_left - k) for k in everything}
+    largest = max(logs.values())
+    ignore_count = largest == -math.inf
+
+    def weight(k):
+        if ignore_count:
+            return 1
+        return math.exp(logs.get(k, log_comb(others, mines_left - k)) - largest)
+
+    normal = sum(ways * weight(k) for k, ways in everything.items())
+    if not normal:
+        # The mine count contradicts the estimates, so leave it out
+        ignore_count = True
+        normal = sum(everything.values())
+
+    result = {}
+    for n, (cells, layouts) in enumerate(groups):
+        rest = convolve(before[n], after[n + 1])
+        for k, (_, mines) in layouts.items():
+            # Weight of this component holding k mines, over all the others
+            share = sum(ways * weight(k + k_rest) for k_rest, ways in rest.items())
+            for cell, count in zip(cells, mines):
+                result[cell] = result.get(cell, 0) + count * share
+    for cell in result:
+        result[cell] /= normal
+
+    if not others:
+        return result, 0.0
+    expected = sum(ways * weight(k) * (mines_left - k) for k, ways in everything.items())
+    return result, min(max(expected / normal / others, 0.0), 1.0)
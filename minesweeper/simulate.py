@@ -0,0 +1,111 @@
+"""
+Headless Minesweeper self-play
+
+Plays many seeded games with MinesweeperAI, without pygame, spread over a
+process pool, and reports the win rate, moves per second and how long
+each knowledge update takes. Game n is always played with seed SEED + n,
+so a run gives the same games on any number of workers.
+
+    python simulate.py [games height width density]
+"""
+
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmark import percentile
+from minesweeper import Minesweeper, MinesweeperAI
+
+# Defaults: 30x16 expert games
+GAMES = 100
+HEIGHT = 16
+WIDTH = 30
+DENSITY = 99 / 480
+
+# Seed of the first game
+SEED = 0
+
+# Games handed to a worker at a time
+CHUNK_SIZE = 4
+
+# Whether a move opens the whole region around a cell with no mines nearby,
+# as the runner does, instead of one cell per move
+FLOOD_FILL = True
+
+
+def play_game(job):
+    """
+    Plays one game of height x width with mines mines from seed, returning
+    (won, moves, seconds each knowledge update took).
+    """
+    seed, height, width, mines = job
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = MinesweeperAI(height=height, width=width, mines=mines)
+
+    latencies = []
+    opened = 0
+    while opened < height * width - mines:
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+        if game.is_mine(move):
+            return False, len(latencies), latencies
+        # Only the AI's update is timed, not the game opening the cells
+        if FLOOD_FILL:
+            cells = game.reveal(move)
+            start = time.perf_counter()
+            ai.add_knowledge_batch(cells)
+            opened += len(cells)
+        else:
+            count = game.nearby_mines(move)
+            start = time.perf_counter()
+            ai.add_knowledge(move, count)
+            opened += 1
+        latencies.append(time.perf_counter() - start)
+    return True, len(latencies), latencies
+
+
+def simulate(games, height, width, mines, workers=None):
+    """
+    Plays games games on a process pool, returning their results in seed order.
+    """
+    jobs = [(SEED + n, height, width, mines) for n in range(games)]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(play_game, jobs, chunksize=CHUNK_SIZE))
+
+
+def main():
+    if len(sys.argv) == 1:
+        games, height, width, density = GAMES, HEIGHT, WIDTH, DENSITY
+    elif len(sys.argv) == 5:
+        games, height, width = (int(arg) for arg in sys.argv[1:4])
+        density = float(sys.argv[4])
+    else:
+        sys.exit("Usage: python simulate.py [games height width density]")
+    mines = round(height * width * density)
+    if not 0 < mines < height * width:
+        sys.exit("Density must leave at least one mine and one safe cell")
+
+    workers = os.cpu_count()
+    start = time.perf_counter()
+    results = simulate(games, height, width, mines, workers)
+    seconds = time.perf_counter() - start
+
+    wins = sum(won for won, _, _ in results)
+    moves = sum(count for _, count, _ in results)
+    latencies = sorted(latency for _, _, game in results for latency in game)
+    print(f"{games} games of {height}x{width} with {mines} mines on {workers} workers "
+          f"in {seconds:.2f}s")
+    print(f"Won {wins} ({wins / games:.1%}), {moves} moves, {moves / seconds:,.0f} moves/s")
+    if latencies:
+        print(f"Knowledge update: p50 {percentile(latencies, 0.5) * 1e6:.0f}us, "
+              f"p90 {percentile(latencies, 0.9) * 1e6:.0f}us, "
+              f"p99 {percentile(latencies, 0.99) * 1e6:.0f}us, "
+              f"max {latencies[-1] * 1e6:.0f}us, mean {sum(latencies) / len(latencies) * 1e6:.0f}us")
+
+
+if __name__ == "__main__":
+    main()
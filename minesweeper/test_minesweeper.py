@@ -0,0 +1,43 @@
+import unittest
+
+import probability
+from minesweeper import MinesweeperAI
+
+
+class ProbabilityTest(unittest.TestCase):
+
+    def test_small_component_is_exact(self):
+        # One mine in two cells, one of which also shares a mine with a third
+        sentences = [({(0, 0), (0, 1)}, 1), ({(0, 1), (0, 2)}, 1)]
+        chances, others = probability.probabilities(sentences, 3, 1)
+        self.assertEqual(chances, {(0, 0): 0.0, (0, 1): 1.0, (0, 2): 0.0})
+        self.assertEqual(others, 0.0)
+
+    def test_large_frontier_falls_back_to_estimate(self):
+        # A chain of 1500 cells, each adjacent pair holding one mine
+        cells = [(0, j) for j in range(1500)]
+        sentences = [({cells[j], cells[j + 1]}, 1) for j in range(len(cells) - 1)]
+        chances, others = probability.probabilities(sentences, 3000, 750)
+        self.assertEqual(set(chances), set(cells))
+        for chance in chances.values():
+            self.assertTrue(0.0 <= chance <= 1.0)
+        self.assertTrue(0.0 <= others <= 1.0)
+
+
+class MinesweeperAITest(unittest.TestCase):
+
+    def test_public_methods_take_tuples(self):
+        ai = MinesweeperAI(height=3, width=3, mines=1)
+        ai.add_knowledge((0, 0), 1)
+        self.assertEqual(ai.neighbors_cell((0, 0)), ({(0, 1), (1, 0), (1, 1)}, 0))
+
+        ai.mark_mine((0, 1))
+        ai.mark_safe((1, 1))
+        ai.infer()
+        self.assertEqual(ai.cells(ai.mines), {(0, 1)})
+        self.assertEqual(ai.neighbors_cell((0, 0)), (set(), 1))
+        self.assertIn(ai.make_safe_move(), {(1, 0), (1, 1)})
+
+
+if __name__ == "__main__":
+    unittest.main()
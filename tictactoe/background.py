@@ -0,0 +1,81 @@
+"""
+AI moves computed in a background thread
+
+The search runs beside the pygame loop, so the window keeps drawing and
+handling events while the AI thinks. The search reports its progress and
+checks for cancellation through search.progress, every few hundred
+positions, so a search that is no longer wanted stops almost at once.
+"""
+
+import threading
+import time
+
+import search
+import tictactoe as ttt
+
+
+class BackgroundMove():
+    """
+    One AI move being computed in a worker thread
+    """
+
+    def __init__(self, board):
+        self.nodes = 0
+        self.depth = 0
+        self.move = None
+        self.done = False
+        self.cancelled = False
+        self.error = None
+        self.started = time.perf_counter()
+
+        # The board is copied, since the caller may replace it while we think
+        board = [list(row) for row in board]
+        self.thread = threading.Thread(target=self.think, args=(board,), daemon=True)
+        self.thread.start()
+
+    def think(self, board):
+        """
+        Runs minimax on board, publishing progress as it goes.
+        """
+        search.progress = self.report
+        try:
+            self.move = ttt.minimax(board)
+        except Exception as error:
+            self.error = error
+        finally:
+            # A newer search may have installed its own callback meanwhile
+            if search.progress == self.report:
+                search.progress = None
+            self.done = True
+
+    def report(self, nodes, depth):
+        """
+        Progress callback for search.Search, which also stops a cancelled search.
+        """
+        self.nodes = nodes
+        self.depth = depth
+        if self.cancelled:
+            raise search.Timeout
+
+    def result(self):
+        """
+        Returns the move once the worker has found it, or None
+        while it is still thinking. Never blocks.
+        """
+        if not self.done:
+            return None
+        if self.error is not None:
+            raise RuntimeError("AI search failed") from self.error
+        return self.move
+
+    def elapsed(self):
+        """
+        Returns the seconds spent thinking so far.
+        """
+        return time.perf_counter() - self.started
+
+    def cancel(self):
+        """
+        Stops the search, for when the game is reset or the window closed.
+        """
+        self.cancelled = True
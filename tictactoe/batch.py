@@ -0,0 +1,142 @@
+"""
+Batch position evaluation
+
+Reads one JSON object per line, each with a "board" in the same form as
+the tictactoe module (a list of rows of "X", "O" or null) and an optional
+"win_length", and writes one JSON object per line with the value of the
+position for X (1, 0 or -1, like utility) and the best move for the
+player to move.
+
+Positions are deduplicated by canonical form, so all rotations and
+reflections of a position are solved once, and the distinct positions are
+spread over a process pool. Each worker keeps one transposition table per
+board shape for all the positions it is given, so positions that share
+lines of play are only searched once per worker. Boards must be small
+enough to solve exactly, as with minimax on boards of up to EXACT_CELLS.
+"""
+
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import bitboard
+import tictactoe as ttt
+
+# Number of positions handed to a worker at a time; large chunks keep
+# positions from the same games together, which share table entries
+CHUNK_SIZE = 256
+
+
+def solve(job):
+    """
+    Solves one canonical position, returning (value, cell) for the player
+    to move, who holds own.
+    """
+    rows, columns, length, own, other = job
+    shape = bitboard.geometry(rows, columns, length)
+    return bitboard.negamax(own, other, -2, 2, shape)
+
+
+def parse_board(record):
+    """
+    Returns (board, win length) for one input record,
+    or raises ValueError if it is not a valid position.
+    """
+    board = record.get("board")
+    length = record.get("win_length", ttt.WIN_LENGTH)
+    if not isinstance(board, list) or not board or not all(isinstance(row, list) for row in board):
+        raise ValueError("board must be a list of rows")
+    if any(len(row) != len(board[0]) for row in board) or not board[0]:
+        raise ValueError("board rows must all have the same length")
+    if any(cell not in (ttt.X, ttt.O, ttt.EMPTY) for row in board for cell in row):
+        raise ValueError(f"cells must be {ttt.X!r}, {ttt.O!r} or null")
+    if len(board) * len(board[0]) > ttt.EXACT_CELLS:
+        raise ValueError(f"board must have at most {ttt.EXACT_CELLS} cells to be solved exactly")
+    if not isinstance(length, int) or length < 1:
+        raise ValueError("win_length must be a positive integer")
+    x, o = ttt.to_bitboards(board)
+    if bin(x).count("1") - bin(o).count("1") not in (0, 1):
+        raise ValueError("X moves first, so X must have as many marks as O or one more")
+    shape = bitboard.geometry(len(board), len(board[0]), length)
+    if (any(x & mask == mask for mask in shape.wins)
+            and any(o & mask == mask for mask in shape.wins)):
+        raise ValueError("X and O cannot both have a complete line")
+    return board, length
+
+
+def evaluate(boards, workers=None):
+    """
+    Returns (value, move) for every (board, win length) in boards, where
+    value is 1 if X wins with best play, -1 if O wins and 0 for a tie,
+    and move is the best (i, j) action, or None if the game is over.
+    """
+    results = [None] * len(boards)
+
+    # Maps each distinct canonical position to the boards it stands for
+    jobs = {}
+    for n, (board, length) in enumerate(boards):
+        rows, columns = len(board), len(board[0])
+        shape = bitboard.geometry(rows, columns, length)
+        x, o = ttt.to_bitboards(board)
+        x_to_move = bin(x).count("1") == bin(o).count("1")
+        if any(x & mask == mask for mask in shape.wins):
+            results[n] = (1, None)
+            continue
+        if any(o & mask == mask for mask in shape.wins):
+            results[n] = (-1, None)
+            continue
+        if x | o == shape.full:
+            results[n] = (0, None)
+            continue
+        own, other = (x, o) if x_to_move else (o, x)
+        key, cells = shape.canonical(own, other)
+        job = (rows, columns, length, key >> shape.cells, key & shape.full)
+        jobs.setdefault(job, []).append((n, cells, x_to_move))
+
+    with ProcessPoolExecutor(workers) as pool:
+        solved = pool.map(solve, jobs, chunksize=CHUNK_SIZE)
+        for (job, boards_for_job), (value, cell) in zip(jobs.items(), solved):
+            columns = job[1]
+            for n, cells, x_to_move in boards_for_job:
+                move = divmod(cell if cells is None else cells[cell], columns)
+                results[n] = (value if x_to_move else -value, move)
+    return results
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        sys.exit("Usage: python batch.py boards.ndjson [output.ndjson]")
+
+    records = []
+    with open(sys.argv[1], encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+
+    # Invalid boards get an error instead of a value
+    boards, errors = [], {}
+    for n, record in enumerate(records):
+        try:
+            boards.append(parse_board(record))
+        except ValueError as error:
+            errors[n] = str(error)
+    results = iter(evaluate(boards, os.cpu_count()))
+
+    output = open(sys.argv[2], "w", encoding="utf-8") if len(sys.argv) == 3 else sys.stdout
+    try:
+        for n, record in enumerate(records):
+            if n in errors:
+                answer = {"board": record.get("board"), "error": errors[n]}
+            else:
+                value, move = next(results)
+                answer = {"board": record["board"], "value": value,
+                          "move": None if move is None else list(move)}
+            output.write(json.dumps(answer) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+import math
+import os
+import sys
+import time
+
+import batch
+import bitboard
+import book
+import mcts
+import parallel
+import search
+import stats
+import tictactoe as ttt
+
+# (rows, columns, win length) played by the mnk benchmark
+VARIANTS = [(4, 4, 4), (7, 7, 4), (15, 15, 5)]
+
+# Board solved exactly by the parallel benchmark, and the cells X opens on
+PARALLEL_SHAPE = (4, 4, 4)
+PARALLEL_OPENINGS = [0, 1, 5]
+
+# Seconds per move in the mnk benchmark, and the most moves played per game
+MNK_BUDGET = 0.5
+MNK_MOVES = 30
+
+# (rows, columns, win length), games per board and seconds per move for the mcts benchmark
+MCTS_VARIANTS = [(4, 4, 4), (6, 6, 4), (7, 7, 5)]
+MCTS_GAMES = 4
+MCTS_BUDGET = 0.1
+
+
+def counting(function, counter):
+    """
+    Wraps a search function so every call counts as one node in counter.
+    """
+    def wrapper(*args, **kwargs):
+        counter[0] += 1
+        return function(*args, **kwargs)
+    return wrapper
+
+
+def count_nodes(function, *args):
+    """
+    Returns (result, nodes, seconds) for calling function, where nodes is
+    the number of MAX_PLAYER, MIN_PLAYER and bitboard.negamax calls it made.
+    """
+    counter = [0]
+    max_player, min_player, negamax = ttt.MAX_PLAYER, ttt.MIN_PLAYER, bitboard.negamax
+    ttt.MAX_PLAYER = counting(max_player, counter)
+    ttt.MIN_PLAYER = counting(min_player, counter)
+    bitboard.negamax = counting(negamax, counter)
+    try:
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+    finally:
+        ttt.MAX_PLAYER, ttt.MIN_PLAYER, bitboard.negamax = max_player, min_player, negamax
+    return result, counter[0], seconds
+
+
+def self_play():
+    """
+    Plays one game of the AI against itself, returning the final board.
+    """
+    board = ttt.initial_state()
+    while not ttt.terminal(board):
+        board = ttt.result(board, ttt.minimax(board))
+    return board
+
+
+def reachable_boards():
+    """
+    Returns every position reachable from the empty board where
+    the game is not over yet, each once.
+    """
+    boards = {}
+    frontier = [ttt.initial_state()]
+    while frontier:
+        board = frontier.pop()
+        key = str(board)
+        if key in boards or ttt.terminal(board):
+            continue
+        boards[key] = board
+        for action in ttt.actions(board):
+            frontier.append(ttt.result(board, action))
+    return list(boards.values())
+
+
+def solve_all(boards):
+    """
+    Returns the move minimax picks on every board.
+    """
+    return [ttt.minimax(board) for board in boards]
+
+
+def timed(function, *args):
+    """
+    Returns (result, seconds) for calling function.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def report(label, nodes, seconds):
+    print(f"  {label:<30} {nodes:>8} nodes {seconds * 1000:>9.2f}ms")
+
+
+def benchmark_transpositions():
+    """
+    Compares node counts and timings with and without the transposition table.
+    """
+    ttt.BITBOARDS = ttt.BOOK = False
+    for enabled in (False, True):
+        ttt.TRANSPOSITIONS = enabled
+        ttt.transpositions.clear()
+        print(f"Transposition table {'on' if enabled else 'off'}:")
+
+        _, nodes, seconds = count_nodes(ttt.minimax, ttt.initial_state())
+        report("first move (cold)", nodes, seconds)
+        _, nodes, seconds = count_nodes(ttt.minimax, ttt.initial_state())
+        report("first move (warm)", nodes, seconds)
+
+        ttt.transpositions.clear()
+        board, nodes, seconds = count_nodes(self_play)
+        report("self-play game", nodes, seconds)
+        if ttt.winner(board) is not None:
+            sys.exit(f"Self-play should end in a tie, {ttt.winner(board)} won")
+        if enabled:
+            print(f"  {len(ttt.transpositions)} positions stored")
+    ttt.TRANSPOSITIONS = True
+    ttt.BITBOARDS = ttt.BOOK = True
+
+
+def benchmark_bitboards():
+    """
+    Compares the list engine with the bitboard engine, with and without
+    transposition tables, and checks the bitboard moves are all optimal.
+    """
+    boards = reachable_boards()
+    print(f"{len(boards)} reachable positions")
+    ttt.BOOK = False
+    moves = {}
+    for enabled in (False, True):
+        ttt.BITBOARDS = enabled
+        print(f"{'Bitboard' if enabled else 'List'} engine:")
+        for transpositions in (False, True):
+            ttt.TRANSPOSITIONS = bitboard.TRANSPOSITIONS = transpositions
+            ttt.transpositions.clear()
+            bitboard.clear_transpositions()
+            table = "with table" if transpositions else "no table"
+            _, nodes, seconds = count_nodes(ttt.minimax, ttt.initial_state())
+            report(f"first move, {table}", nodes, seconds)
+            moves[enabled], nodes, seconds = count_nodes(solve_all, boards)
+            report(f"every position, {table}", nodes, seconds)
+
+    # Both engines play optimally, but may pick different equally good moves
+    ttt.BITBOARDS = False
+    ttt.transpositions.clear()
+    for board, move in zip(boards, moves[True]):
+        best = ttt.MAX_PLAYER if ttt.player(board) == ttt.X else ttt.MIN_PLAYER
+        value, _ = best(board, -math.inf, math.inf)
+        reply = ttt.result(board, move)
+        if ttt.terminal(reply):
+            found = ttt.utility(reply)
+        else:
+            found, _ = (ttt.MAX_PLAYER if ttt.player(reply) == ttt.X else ttt.MIN_PLAYER)(
+                reply, -math.inf, math.inf)
+        if found != value:
+            sys.exit(f"Bitboard move {move} loses value on {board}")
+    ttt.BITBOARDS = ttt.BOOK = True
+
+
+def benchmark_book():
+    """
+    Times solving and loading the 3x3 book, and compares book moves
+    with searched ones on every reachable position.
+    """
+    shape = bitboard.geometry(3, 3, 3)
+    start = time.perf_counter()
+    opening = book.Book.solve(shape)
+    print(f"Solved in {(time.perf_counter() - start) * 1000:.1f}ms, "
+          f"{len(opening.entries)} byte table")
+
+    boards = reachable_boards()
+    for label, enabled in (("search", False), ("book", True)):
+        ttt.BOOK = enabled
+        bitboard.clear_transpositions()
+        book.books[(3, 3, 3)] = opening
+        _, seconds = timed(ttt.minimax, ttt.initial_state())
+        print(f"  {label:<8} first move in {seconds * 1000:.2f}ms")
+        start = time.perf_counter()
+        moves = solve_all(boards)
+        seconds = time.perf_counter() - start
+        print(f"  {label:<8} {len(boards)} positions in {seconds * 1000:.1f}ms, "
+              f"{seconds / len(boards) * 1e6:.1f}us per move")
+    book.books.clear()
+
+    # Every book move must keep the value of the position
+    for board, move in zip(boards, moves):
+        x, o = ttt.to_bitboards(board)
+        value, _ = opening.lookup(x, o)
+        reply = ttt.result(board, move)
+        if ttt.terminal(reply):
+            found = 1 if ttt.winner(reply) else 0
+        else:
+            found = -opening.lookup(*ttt.to_bitboards(reply))[0]
+        if found != value:
+            sys.exit(f"Book move {move} loses value on {board}")
+
+
+def benchmark_mnk():
+    """
+    Plays the time-limited search against itself on larger boards,
+    reporting depth reached, search speed and the slowest move.
+    """
+    for rows, columns, length in VARIANTS:
+        shape = bitboard.geometry(rows, columns, length)
+        own = other = 0
+        depths, nodes, slowest, seconds = [], 0, 0, 0
+        for _ in range(MNK_MOVES):
+            searcher = search.Search(shape, MNK_BUDGET)
+            start = time.perf_counter()
+            cell, _ = searcher.best_move(own, other)
+            elapsed = time.perf_counter() - start
+            slowest = max(slowest, elapsed)
+            seconds += elapsed
+            nodes += searcher.nodes
+            depths.append(searcher.depth)
+            mine = own | 1 << cell
+            if shape.wins_with(mine, cell) or mine | other == shape.full:
+                break
+            own, other = other, mine
+        print(f"{rows}x{columns}, {length} in a row: {len(depths)} moves, "
+              f"depth {min(depths)}-{max(depths)}, {nodes / seconds:,.0f} nodes/s, "
+              f"slowest move {slowest * 1000:.0f}ms of {MNK_BUDGET * 1000:.0f}ms")
+
+
+def benchmark_mcts():
+    """
+    Plays Monte Carlo tree search against the time-limited alpha-beta
+    search with the same budget per move, each taking the first move in
+    half the games, and reports the score of the tree search.
+    """
+    for rows, columns, length in MCTS_VARIANTS:
+        shape = bitboard.geometry(rows, columns, length)
+        wins = draws = losses = playouts = 0
+        seconds = 0.0
+        for game in range(MCTS_GAMES):
+            tree = mcts.MCTS(shape, MCTS_BUDGET, seed=game)
+            own = other = 0
+            turn = game % 2
+            while True:
+                start = time.perf_counter()
+                if turn == 0:
+                    cell, _ = tree.best_move(own, other)
+                    playouts += tree.playouts
+                    seconds += time.perf_counter() - start
+                else:
+                    cell, _ = search.Search(shape, MCTS_BUDGET).best_move(own, other)
+                mine = own | 1 << cell
+                if shape.wins_with(mine, cell):
+                    if turn == 0:
+                        wins += 1
+                    else:
+                        losses += 1
+                    break
+                if mine | other == shape.full:
+                    draws += 1
+                    break
+                own, other = other, mine
+                turn = 1 - turn
+        score = (wins + draws / 2) / MCTS_GAMES
+        print(f"{rows}x{columns}, {length} in a row: {wins} wins, {draws} draws, {losses} losses "
+              f"against alpha-beta ({score:.0%}), {playouts / seconds:,.0f} playouts/s")
+
+
+def benchmark_parallel():
+    """
+    Solves a few 4x4 openings serially and with root splitting on
+    growing worker counts, checking every answer matches the serial one.
+    """
+    shape = bitboard.geometry(*PARALLEL_SHAPE)
+    positions = [(0, 1 << cell) for cell in PARALLEL_OPENINGS]
+
+    bitboard.clear_transpositions()
+    start = time.perf_counter()
+    expected = []
+    for own, other in positions:
+        value, cell = bitboard.negamax(own, other, -2, 2, shape)
+        expected.append((cell, value))
+    serial = time.perf_counter() - start
+    print(f"Serial: {serial:.2f}s")
+
+    counts = sorted({1, 2, 4, os.cpu_count()})
+    for workers in counts:
+        # A fresh pool per count, so no worker starts with a warm table
+        parallel.shutdown()
+        parallel.get_pool(workers)
+        start = time.perf_counter()
+        found = [parallel.best_move(own, other, shape, workers=workers) for own, other in positions]
+        seconds = time.perf_counter() - start
+        if found != expected:
+            sys.exit(f"Parallel result {found} does not match serial {expected}")
+        print(f"  {workers:>3} workers: {seconds:.2f}s, speedup {serial / seconds:.2f}x")
+    parallel.shutdown()
+
+
+def benchmark_stats():
+    """
+    Times solving every position with the stats collector off and on,
+    and prints the totals it gathered.
+    """
+    boards = reachable_boards()
+    ttt.BOOK = False
+    for enabled in (False, True):
+        collector = stats.enable() if enabled else None
+        bitboard.clear_transpositions()
+        _, seconds = timed(solve_all, boards)
+        stats.disable()
+        print(f"Collector {'on' if enabled else 'off'}: {seconds * 1000:.1f}ms")
+    ttt.BOOK = True
+
+    total = collector.as_dict()["total"]
+    print(f"  {total['nodes']} nodes, {total['nodes_per_second']:,.0f} nodes/s, "
+          f"cutoff rate {total['cutoff_rate']:.1%}, table hit rate {total['hit_rate']:.1%}")
+
+
+def benchmark_batch():
+    """
+    Times solving every position one minimax call at a time, and as one
+    batch deduplicated by symmetry.
+    """
+    boards = reachable_boards()
+    ttt.BOOK = False
+    bitboard.clear_transpositions()
+    _, seconds = timed(solve_all, boards)
+    ttt.BOOK = True
+    print(f"minimax per board: {len(boards)} boards {seconds * 1000:.1f}ms")
+
+    bitboard.clear_transpositions()
+    _, seconds = timed(batch.evaluate, [(board, ttt.WIN_LENGTH) for board in boards])
+    print(f"batch.evaluate:    {len(boards)} boards {seconds * 1000:.1f}ms")
+
+
+BENCHMARKS = {
+    "transpositions": benchmark_transpositions,
+    "bitboards": benchmark_bitboards,
+    "mnk": benchmark_mnk,
+    "mcts": benchmark_mcts,
+    "book": benchmark_book,
+    "parallel": benchmark_parallel,
+    "stats": benchmark_stats,
+    "batch": benchmark_batch,
+}
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] not in BENCHMARKS:
+        sys.exit(f"Usage: python benchmark.py {'|'.join(BENCHMARKS)}")
+    BENCHMARKS[sys.argv[1]]()
+
+
+if __name__ == "__main__":
+    main()
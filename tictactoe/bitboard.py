@@ -0,0 +1,251 @@
+"""
+Bitboard engine for Tic Tac Toe
+
+A position is two ints, one per player, where bit i * columns + j is set
+when that player holds cell (i, j). Win detection, move generation and
+undo are then a few bit operations against masks precomputed once per
+board shape, and no board is ever copied: making a move is an OR, and
+undoing it is just going back to the previous ints.
+
+The search works from the point of view of the player to move (negamax),
+so it takes (own, other) rather than (x, o).
+"""
+
+# Whether negamax uses the transposition table
+TRANSPOSITIONS = True
+
+# Collector notified of every node, cutoff and table probe when set; see stats.py
+stats = None
+
+# Bound types stored in the transposition table
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Precomputed masks and tables for each (rows, columns, win length)
+geometries = {}
+
+
+class Geometry():
+    """
+    Masks and lookup tables for one board shape and win length
+    """
+
+    def __init__(self, rows, columns, length):
+        self.rows = rows
+        self.columns = columns
+        self.length = length
+        self.cells = rows * columns
+        self.full = (1 << self.cells) - 1
+
+        # Every run of length cells in a row, column or diagonal
+        self.wins = []
+        for i in range(rows):
+            for j in range(columns):
+                for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_i, end_j = i + di * (length - 1), j + dj * (length - 1)
+                    if 0 <= end_i < rows and 0 <= end_j < columns:
+                        self.wins.append(sum(1 << ((i + di * n) * columns + j + dj * n)
+                                             for n in range(length)))
+
+        # Only lines through the last move can have been completed by it
+        self.wins_through = [[mask for mask in self.wins if mask >> cell & 1]
+                             for cell in range(self.cells)]
+
+        # Cells on many lines first, which puts the centre first and prunes far more
+        self.order = sorted(range(self.cells), key=lambda cell: -len(self.wins_through[cell]))
+
+        # Cells next to each cell, for searching only near the stones on large boards
+        self.near = []
+        for i in range(rows):
+            for j in range(columns):
+                mask = 0
+                for ni in range(max(i - 1, 0), min(i + 2, rows)):
+                    for nj in range(max(j - 1, 0), min(j + 2, columns)):
+                        mask |= 1 << (ni * columns + nj)
+                self.near.append(mask)
+
+        # Maps canonical (own, other) keys to (value, bound, best cell in canonical coordinates)
+        self.transpositions = {}
+        self.symmetries = None
+
+    def symmetry_tables(self, transform):
+        """
+        Returns (tables, cells) for one rotation or reflection. tables[i]
+        maps the bits of row i to where they land once transformed, and
+        cells maps each transformed cell back to the original cell.
+        """
+        columns = self.columns
+        tables = []
+        for i in range(self.rows):
+            table = []
+            for row in range(1 << columns):
+                bits = 0
+                for j in range(columns):
+                    if row >> j & 1:
+                        ti, tj = transform(i, j)
+                        bits |= 1 << (ti * columns + tj)
+                table.append(bits)
+            tables.append(table)
+        cells = [0] * self.cells
+        for i in range(self.rows):
+            for j in range(columns):
+                ti, tj = transform(i, j)
+                cells[ti * columns + tj] = i * columns + j
+        return tables, cells
+
+    def transform(self, bits, tables):
+        """
+        Returns bits moved by one symmetry, one row lookup at a time.
+        """
+        columns = self.columns
+        row_mask = (1 << columns) - 1
+        moved = 0
+        for table in tables:
+            moved |= table[bits & row_mask]
+            bits >>= columns
+        return moved
+
+    def canonical(self, own, other):
+        """
+        Returns (key, cells) where key is the same for all symmetric versions
+        of the position, and cells maps its cells back to this position's,
+        or None for the identity.
+        """
+        if self.symmetries is None:
+            # Built on first use, since only small boards are solved exactly
+            rows, columns = self.rows - 1, self.columns - 1
+            transforms = [
+                lambda i, j: (rows - i, columns - j),
+                lambda i, j: (i, columns - j),
+                lambda i, j: (rows - i, j),
+            ]
+            if rows == columns:
+                transforms += [
+                    lambda i, j: (j, columns - i),
+                    lambda i, j: (columns - j, i),
+                    lambda i, j: (j, i),
+                    lambda i, j: (columns - j, columns - i),
+                ]
+            self.symmetries = [self.symmetry_tables(transform) for transform in transforms]
+
+        key = own << self.cells | other
+        cells = None
+        for tables, symmetric_cells in self.symmetries:
+            candidate = self.transform(own, tables) << self.cells | self.transform(other, tables)
+            if candidate < key:
+                key, cells = candidate, symmetric_cells
+        return key, cells
+
+    def wins_with(self, bits, cell):
+        """
+        Returns True if playing cell completed a line in bits.
+        """
+        return any(bits & mask == mask for mask in self.wins_through[cell])
+
+
+def geometry(rows, columns, length):
+    """
+    Returns the Geometry for a board shape and win length, building it on first use.
+    """
+    key = (rows, columns, length)
+    if key not in geometries:
+        geometries[key] = Geometry(rows, columns, length)
+    return geometries[key]
+
+
+def principal_variation(own, other, shape):
+    """
+    Returns the cells of the best line of play found from a position,
+    following the best moves stored in the transposition table.
+    """
+    line = []
+    while True:
+        key, cells = shape.canonical(own, other)
+        entry = shape.transpositions.get(key)
+        if entry is None or entry[2] is None:
+            return line
+        cell = entry[2] if cells is None else cells[entry[2]]
+        line.append(cell)
+        mine = own | 1 << cell
+        if shape.wins_with(mine, cell) or mine | other == shape.full:
+            return line
+        own, other = other, mine
+
+
+def clear_transpositions():
+    """
+    Empties the transposition tables of every board shape.
+    """
+    for shape in geometries.values():
+        shape.transpositions.clear()
+
+
+def negamax(own, other, alpha, beta, shape):
+    """
+    Returns (value, cell) for the player to move, who holds own: 1 for a
+    win, -1 for a loss and 0 for a tie with best play, and the cell to
+    play, or None if the game is over.
+
+    own and other must not hold a complete line, since the player who
+    made the last move is checked for a win by the caller.
+    """
+    collector = stats
+    if collector is not None:
+        collector.node(bin(own | other).count("1"))
+    empty = shape.full & ~(own | other)
+    if not empty:
+        return 0, None
+
+    # checking the transposition table before searching
+    first = None
+    if TRANSPOSITIONS:
+        key, cells = shape.canonical(own, other)
+        entry = shape.transpositions.get(key)
+        if entry is not None:
+            value, bound, first = entry
+            if first is not None and cells is not None:
+                first = cells[first]
+            settled = (bound == EXACT or (bound == LOWER and value >= beta)
+                       or (bound == UPPER and value <= alpha))
+            if collector is not None:
+                collector.probe(True, settled)
+            if settled:
+                return value, first
+        elif collector is not None:
+            collector.probe(False, False)
+    alpha_original = alpha
+    if collector is not None:
+        collector.expand()
+
+    best_value, best_cell = -2, None
+    moves = shape.order if first is None else [first] + [cell for cell in shape.order if cell != first]
+    for cell in moves:
+        bit = 1 << cell
+        if not empty & bit:
+            continue
+        mine = own | bit
+        if shape.wins_with(mine, cell):
+            value = 1
+        else:
+            value = -negamax(other, mine, -beta, -alpha, shape)[0]
+        if value > best_value:
+            best_value, best_cell = value, cell
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            if collector is not None:
+                collector.cutoff()
+            break
+
+    if TRANSPOSITIONS:
+        if best_value <= alpha_original:
+            bound = UPPER
+        elif best_value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        stored = best_cell
+        if cells is not None:
+            stored = cells.index(best_cell)
+        shape.transpositions[key] = (best_value, bound, stored)
+    return best_value, best_cell
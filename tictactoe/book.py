@@ -0,0 +1,167 @@
+"""
+Perfect-play book for small Tic Tac Toe boards
+
+Small boards are solved once, visiting every reachable position a single
+time, and the best move and value of each position are written to a file.
+The file holds one byte per possible position, at the position's base-3
+number, so looking a move up is a couple of table reads:
+
+    bits 0-3   best cell to play
+    bits 4-5   value for the player to move, plus 1
+    0xFF       position not reachable, or game over
+
+Usage: python book.py [rows columns win_length]
+"""
+
+import os
+import struct
+import sys
+
+import bitboard
+
+BOOK_MAGIC = b"TTTBOOK1"
+
+# magic, rows, columns, win length
+HEADER = struct.Struct("<8sIII")
+
+NO_ENTRY = 0xFF
+
+# Boards with more cells than this would need too large a book
+BOOK_CELLS = 12
+
+# Loaded books for each board shape, None when there is no book file
+books = {}
+
+
+def book_path(rows, columns, length):
+    """
+    Returns where the book for a board shape is stored, next to this module.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        f"tictactoe-{rows}x{columns}-{length}.book")
+
+
+class Book():
+    """
+    Best move and value of every reachable position on one board shape
+    """
+
+    def __init__(self, shape, entries):
+        self.shape = shape
+        self.entries = entries
+
+        # Base-3 position number contributed by each player's bits
+        self.powers = [0] * (1 << shape.cells)
+        for bits in range(1, len(self.powers)):
+            low = bits & -bits
+            self.powers[bits] = self.powers[bits ^ low] + 3 ** (low.bit_length() - 1)
+
+    @classmethod
+    def solve(cls, shape):
+        """
+        Solves every position reachable from the empty board.
+        """
+        # Maps (own, other) to (value, plies until the game ends, best cell)
+        solved = {}
+
+        def solve_position(own, other):
+            if (own, other) in solved:
+                return solved[(own, other)]
+            empty = shape.full & ~(own | other)
+            best = None
+            for cell in shape.order:
+                if not empty >> cell & 1:
+                    continue
+                mine = own | 1 << cell
+                if shape.wins_with(mine, cell):
+                    value, plies = 1, 1
+                elif mine | other == shape.full:
+                    value, plies = 0, 1
+                else:
+                    value, plies, _ = solve_position(other, mine)
+                    value, plies = -value, plies + 1
+                # Win as soon as possible, lose as late as possible
+                key = (value, -plies if value > 0 else plies)
+                if best is None or key > best[0]:
+                    best = (key, value, plies, cell)
+            solved[(own, other)] = best[1:]
+            return solved[(own, other)]
+
+        solve_position(0, 0)
+        book = cls(shape, bytearray([NO_ENTRY]) * 3 ** shape.cells)
+        for (own, other), (value, _, cell) in solved.items():
+            # The player to move has placed as many marks as the other, or one fewer
+            x, o = (own, other) if bin(own).count("1") == bin(other).count("1") else (other, own)
+            book.entries[book.index(x, o)] = (value + 1) << 4 | cell
+        return book
+
+    @classmethod
+    def load(cls, shape, path):
+        """
+        Reads a book saved for shape, or returns None if the file is
+        missing, corrupt, or was built for a different board.
+        """
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            magic, rows, columns, length = HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return None
+        if magic != BOOK_MAGIC or (rows, columns, length) != (shape.rows, shape.columns, shape.length):
+            return None
+        if len(data) != HEADER.size + 3 ** shape.cells:
+            return None
+        return cls(shape, data[HEADER.size:])
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(BOOK_MAGIC, self.shape.rows, self.shape.columns, self.shape.length))
+            f.write(self.entries)
+
+    def index(self, x, o):
+        """
+        Returns the base-3 number of a position, with 1 for X and 2 for O.
+        """
+        return self.powers[x] + 2 * self.powers[o]
+
+    def lookup(self, x, o):
+        """
+        Returns (value, cell) for the player to move, or None
+        if the position is not in the book.
+        """
+        entry = self.entries[self.index(x, o)]
+        if entry == NO_ENTRY:
+            return None
+        return (entry >> 4) - 1, entry & 0xF
+
+
+def load_book(shape):
+    """
+    Returns the book for shape, reading it on first use, or None if no
+    book has been written for it.
+    """
+    key = (shape.rows, shape.columns, shape.length)
+    if key not in books:
+        books[key] = None
+        if shape.cells <= BOOK_CELLS:
+            books[key] = Book.load(shape, book_path(*key))
+    return books[key]
+
+
+def main():
+    if len(sys.argv) not in (1, 4):
+        sys.exit("Usage: python book.py [rows columns win_length]")
+    rows, columns, length = (int(arg) for arg in sys.argv[1:]) if len(sys.argv) == 4 else (3, 3, 3)
+    if rows * columns > BOOK_CELLS:
+        sys.exit(f"Books are limited to {BOOK_CELLS} cells")
+
+    shape = bitboard.geometry(rows, columns, length)
+    book = Book.solve(shape)
+    path = book_path(rows, columns, length)
+    book.save(path)
+    positions = sum(entry != NO_ENTRY for entry in book.entries)
+    print(f"Solved {positions} positions, wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Monte Carlo tree search for m,n,k games
+
+Instead of scoring positions with a heuristic, the AI plays many random
+games from them and prefers the moves that win most often (UCT). Each
+iteration walks down the tree picking the child with the best upper
+confidence bound, adds one new position, and plays PLAYOUTS random games
+from it at once, sharing the list of empty cells between them.
+
+The tree is kept between moves: when the AI is asked about a position it
+has already explored, one or two moves below the last one, it carries on
+from that node instead of starting over.
+"""
+
+import math
+import random
+import time
+
+import search
+
+# Seconds the AI may think about each move, unless a number of iterations is given
+BUDGET = 1.0
+
+# Iterations per move instead of a time budget when set
+ITERATIONS = None
+
+# Random games played from each new position
+PLAYOUTS = 8
+
+# Weight of exploring little-tried moves against playing the best ones so far
+EXPLORATION = math.sqrt(2)
+
+# Players kept between moves, one per board shape, so their trees are reused
+players = {}
+
+
+class Node():
+    """
+    One position in the search tree
+    """
+
+    __slots__ = ("own", "other", "cell", "parent", "children", "untried",
+                 "visits", "score", "result")
+
+    def __init__(self, own, other, cell=None, parent=None, result=None):
+        # own belongs to the player to move here
+        self.own = own
+        self.other = other
+        self.cell = cell
+        self.parent = parent
+        self.children = []
+        self.untried = None
+
+        # Games played through this node, and how many of them the player
+        # who moved into it won, counting a draw as half
+        self.visits = 0
+        self.score = 0.0
+
+        # Score for the player who moved into it if the game is over here
+        self.result = result
+
+
+class MCTS():
+    """
+    Monte Carlo tree search on a board shape, kept across moves
+    """
+
+    def __init__(self, shape, budget=None, iterations=None, seed=None):
+        self.shape = shape
+        self.budget = BUDGET if budget is None else budget
+        self.iterations = ITERATIONS if iterations is None else iterations
+        self.random = random.Random(seed)
+        self.root = None
+        self.playouts = 0
+        self.depth = 0
+
+    def best_move(self, own, other):
+        """
+        Returns (cell, value) for the player to move, who holds own, where
+        value is the share of playouts through cell that player won.
+
+        own and other must not hold a complete line, and the board must not be full.
+        """
+        shape = self.shape
+        self.progress = search.progress
+        self.playouts = 0
+        self.root = self.find(own, other)
+        self.depth = 0
+
+        # A move that wins at once needs no search, nor does one that stops
+        # the opponent winning next move, which random playouts easily miss
+        moves = self.moves(own, other)
+        for cell in moves:
+            if shape.wins_with(own | 1 << cell, cell):
+                return cell, 1.0
+        for cell in moves:
+            if shape.wins_with(other | 1 << cell, cell):
+                return cell, 0.5
+
+        deadline = math.inf if self.iterations is not None else time.perf_counter() + self.budget
+        iteration = 0
+        try:
+            while iteration != self.iterations and time.perf_counter() < deadline:
+                self.iterate()
+                iteration += 1
+                if self.progress is not None:
+                    self.progress(self.playouts, self.depth)
+        except search.Timeout:
+            # Cancelled from outside; the most visited move so far still stands
+            pass
+
+        if not self.root.children:
+            return self.moves(own, other)[-1], 0.5
+        best = max(self.root.children, key=lambda child: child.visits)
+        return best.cell, best.score / best.visits
+
+    def find(self, own, other):
+        """
+        Returns the node for a position if it is the root of the last
+        search or one or two moves below it, otherwise a new root.
+        """
+        if self.root is not None:
+            nodes = [self.root]
+            for _ in range(2):
+                nodes = [child for node in nodes for child in node.children]
+                for node in nodes:
+                    if node.own == own and node.other == other:
+                        # The rest of the old tree can no longer be reached
+                        node.parent = None
+                        return node
+        return Node(own, other)
+
+    def moves(self, own, other):
+        """
+        Returns the cells worth trying, least central first, so that
+        popping them tries the centre first.
+
+        On large boards only cells next to a stone are tried, like search.py.
+        """
+        shape = self.shape
+        stones = own | other
+        empty = shape.full & ~stones
+        if not stones:
+            return [shape.order[0]]
+        if shape.cells > search.NEAR_CELLS:
+            near = 0
+            bits = stones
+            while bits:
+                low = bits & -bits
+                near |= shape.near[low.bit_length() - 1]
+                bits ^= low
+            empty &= near
+        return [cell for cell in reversed(shape.order) if empty >> cell & 1]
+
+    def iterate(self):
+        """
+        Runs one selection, expansion, playout and backpropagation.
+        """
+        shape = self.shape
+        node = self.root
+        depth = 0
+
+        # selecting down the tree while every move of the node has been tried
+        while node.result is None:
+            if node.untried is None:
+                node.untried = self.moves(node.own, node.other)
+            if node.untried:
+                break
+            node = self.select(node)
+            depth += 1
+
+        if node.result is not None:
+            # The game is over here, so every playout would end the same way
+            self.backpropagate(node, node.result * PLAYOUTS, PLAYOUTS)
+            return
+
+        # expanding one untried move
+        cell = node.untried.pop()
+        mine = node.own | 1 << cell
+        if shape.wins_with(mine, cell):
+            result = 1.0
+        elif mine | node.other == shape.full:
+            result = 0.5
+        else:
+            result = None
+        child = Node(node.other, mine, cell, node, result)
+        node.children.append(child)
+        self.depth = max(self.depth, depth + 1)
+
+        if result is not None:
+            self.backpropagate(child, result * PLAYOUTS, PLAYOUTS)
+        else:
+            # The playouts score for the player to move in child, not the one who moved into it
+            score = self.playout(child.own, child.other, PLAYOUTS)
+            self.backpropagate(child, PLAYOUTS - score, PLAYOUTS)
+
+    def select(self, node):
+        """
+        Returns the child of node with the highest upper confidence bound.
+        """
+        log_visits = math.log(node.visits)
+        best, best_bound = None, -math.inf
+        for child in node.children:
+            bound = (child.score / child.visits
+                     + EXPLORATION * math.sqrt(log_visits / child.visits))
+            if bound > best_bound:
+                best, best_bound = child, bound
+        return best
+
+    def playout(self, own, other, count):
+        """
+        Plays count random games from a position, returning the score of
+        the player to move, who holds own: 1 per win and a half per draw.
+        """
+        shape = self.shape
+        shuffle = self.random.shuffle
+        wins_through = shape.wins_through
+        empty = [cell for cell in range(shape.cells) if not (own | other) >> cell & 1]
+        score = 0.0
+        for _ in range(count):
+            shuffle(empty)
+            players = [own, other]
+            score += 0.5
+            for n, cell in enumerate(empty):
+                side = n & 1
+                bits = players[side] | 1 << cell
+                players[side] = bits
+                if any(bits & mask == mask for mask in wins_through[cell]):
+                    score += 0.5 if side == 0 else -0.5
+                    break
+        self.playouts += count
+        return score
+
+    def backpropagate(self, node, score, count):
+        """
+        Adds count playouts to node and its ancestors, where score is the
+        part of them won by the player who moved into node.
+        """
+        while node is not None:
+            node.visits += count
+            node.score += score
+            score = count - score
+            node = node.parent
+
+
+def get_player(shape):
+    """
+    Returns the MCTS kept for a board shape, creating it on first use.
+    """
+    if shape not in players:
+        players[shape] = MCTS(shape)
+    return players[shape]
@@ -0,0 +1,197 @@
+"""
+Parallel root splitting for Tic Tac Toe search
+
+The first move at the root is searched on its own, then every other move
+is searched as its own task in a process pool. Workers share the best
+value found so far through shared memory and use it as the alpha bound of
+their window, so once one move is known to draw, the others only need to
+prove they are no better.
+
+Along with alpha, workers share the position in the serial move order of
+the move that set it. A move searched later in that order only has to
+beat alpha, as in the serial search, but an earlier one gets a window one
+point lower, so a tie with the best move still gets its exact value. The
+answer is then the first move in the serial order with the highest value,
+which is exactly what the serial search returns, however the tasks were
+scheduled.
+
+On boards too large to solve, the same split runs each depth of an
+iterative-deepening search in turn, until the time budget runs out. Each
+worker keeps its search tables between the depths of one root position,
+and the previous depth's best move is searched first.
+"""
+
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import bitboard
+import search
+
+WORKERS = os.cpu_count()
+
+# Pool kept between searches, and the [alpha, move number] its workers share
+pool = None
+pool_workers = None
+pool_alpha = None
+
+# [alpha, move number that set it] shared with the other workers, in a worker process
+shared_alpha = None
+
+# Root position and Search of the last depth-limited task, in a worker process
+searcher_root = None
+searcher = None
+
+
+def init_worker(alpha):
+    global shared_alpha
+    shared_alpha = alpha
+    # Forked workers would otherwise start with a copy of the parent's tables
+    bitboard.clear_transpositions()
+    # and with the parent's progress callback
+    search.progress = None
+
+
+def get_pool(workers):
+    """
+    Returns a process pool with workers processes, starting a new one if needed.
+    """
+    global pool, pool_workers, pool_alpha
+    if pool is None or pool_workers != workers:
+        shutdown()
+        pool_alpha = multiprocessing.Array("q", 2)
+        pool = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(pool_alpha,))
+        pool_workers = workers
+    return pool
+
+
+def shutdown():
+    """
+    Stops the worker processes, if any are running.
+    """
+    global pool
+    if pool is not None:
+        pool.shutdown()
+        pool = None
+
+
+def search_move(own, other, number, cell, rows, columns, length, depth, deadline):
+    """
+    Returns (cell, value, nodes) for the player holding own playing cell,
+    the number-th move in the serial order, solved exactly if depth is
+    None, otherwise searched depth moves deep, raising search.Timeout
+    once time.time() passes deadline.
+    """
+    global searcher_root, searcher
+    shape = bitboard.geometry(rows, columns, length)
+    best = 1 if depth is None else search.WIN
+    mine = own | 1 << cell
+    nodes = 0
+    if shape.wins_with(mine, cell):
+        value = best
+    else:
+        with shared_alpha.get_lock():
+            alpha, setter = shared_alpha[0], shared_alpha[1]
+        if number < setter:
+            # Serially this move comes first, so it wins a tie
+            alpha -= 1
+        if depth is None:
+            value = -bitboard.negamax(other, mine, -best - 1, -alpha, shape)[0]
+        else:
+            # Tables from shallower searches of the same root order the moves better
+            if searcher_root != (shape, own, other):
+                searcher_root = (shape, own, other)
+                searcher = search.Search(shape, math.inf)
+            searcher.deadline = time.perf_counter() + deadline - time.time()
+            start = searcher.nodes
+            value = -searcher.alphabeta(other, mine, depth - 1, -best - 1, -alpha, 1)
+            nodes = searcher.nodes - start
+    with shared_alpha.get_lock():
+        if value > shared_alpha[0] or (value == shared_alpha[0] and number < shared_alpha[1]):
+            shared_alpha[0], shared_alpha[1] = value, number
+    return cell, value, nodes
+
+
+def root_moves(own, other, shape, depth):
+    """
+    Returns the root moves in the order the serial search tries them.
+    """
+    empty = shape.full & ~(own | other)
+    if depth is None:
+        return [cell for cell in shape.order if empty >> cell & 1]
+    return search.Search(shape, math.inf).candidates(own, other, empty, 0, None)
+
+
+def best_move(own, other, shape, depth=None, workers=None, deadline=math.inf, first=None):
+    """
+    Returns (cell, value) for the player to move, who holds own, like
+    bitboard.negamax when depth is None and like a fixed-depth
+    search.Search otherwise, searching the root moves in parallel.
+    A depth-limited search raises search.Timeout once time.time() passes
+    deadline, or when search.progress does. first, if given, is searched
+    before the other moves.
+
+    own and other must not hold a complete line, and the board must not be full.
+    """
+    executor = get_pool(WORKERS if workers is None else workers)
+    best = 1 if depth is None else search.WIN
+    pool_alpha[0], pool_alpha[1] = -best - 1, 0
+
+    moves = root_moves(own, other, shape, depth)
+    if first in moves:
+        moves.remove(first)
+        moves.insert(0, first)
+    args = (shape.rows, shape.columns, shape.length, depth, deadline)
+
+    # The first move is usually best, so it is searched on its own to give
+    # the others a tight alpha bound before they all start
+    futures = [executor.submit(search_move, own, other, 0, moves[0], *args)]
+    values = {}
+    nodes = 0
+    try:
+        for n in range(len(moves)):
+            cell, value, searched = futures[n].result()
+            values[cell] = value
+            nodes += searched
+            if n == 0:
+                futures.extend(executor.submit(search_move, own, other, number, cell, *args)
+                               for number, cell in enumerate(moves[1:], 1))
+            if depth is not None and search.progress is not None:
+                search.progress(nodes, depth - 1)
+    except search.Timeout:
+        # Tasks still running would change the shared alpha of the next search
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        raise
+
+    # Ties go to the earliest move, like the serial search
+    cell = max(moves, key=lambda cell: (values[cell], -moves.index(cell)))
+    return cell, values[cell]
+
+
+def iterative_best_move(own, other, shape, budget=None, workers=None):
+    """
+    Returns (cell, value) for the player to move, who holds own, like
+    search.Search.best_move: the root moves are searched in parallel to
+    depth 1, then 2, and so on until the budget runs out or the game is
+    solved, answering with the best move of the deepest search that finished.
+
+    own and other must not hold a complete line, and the board must not be full.
+    """
+    deadline = time.time() + (search.BUDGET if budget is None else budget)
+    empty = shape.full & ~(own | other)
+
+    # Any move beats no move if even depth 1 runs out of time
+    cell, value = root_moves(own, other, shape, 1)[0], 0
+    for depth in range(1, bin(empty).count("1") + 1):
+        try:
+            cell, value = best_move(own, other, shape, depth, workers, deadline, cell)
+        except search.Timeout:
+            break
+        if abs(value) >= search.WIN:
+            # A forced win or loss was found, deeper searches cannot change it
+            break
+    return cell, value
@@ -3,6 +3,20 @@ import sys
 import time
 
 import tictactoe as ttt
+from background import BackgroundMove
+
+# Optional board shape and win length, like: python runner.py 15 15 5
+if len(sys.argv) not in (1, 4):
+    sys.exit("Usage: python runner.py [rows columns win_length]")
+rows, columns = 3, 3
+if len(sys.argv) == 4:
+    rows, columns, ttt.WIN_LENGTH = (int(arg) for arg in sys.argv[1:])
+
+# Frames per second, so the loop never spins faster than it can draw
+FPS = 60
+
+# Shortest time the AI appears to think, so its move does not land instantly
+AI_DELAY = 0.5
 
 pygame.init()
 size = width, height = 600, 400
@@ -15,18 +29,34 @@ screen = pygame.display.set_mode(size)
 
 mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
-moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
+smallFont = pygame.font.Font("OpenSans-Regular.ttf", 16)
+
+# Tiles shrink to fit larger boards in the window
+tile_size = min(80, (height - 120) // rows, (width - 40) // columns)
+moveFont = pygame.font.Font("OpenSans-Regular.ttf", tile_size * 3 // 4)
 
 user = None
-board = ttt.initial_state()
-ai_turn = False
+board = ttt.initial_state(rows, columns)
+# AI move being computed in the background, if any
+thinking = None
+clock = pygame.time.Clock()
 
 while True:
 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
+            if thinking is not None:
+                thinking.cancel()
             sys.exit()
 
+        # Escape abandons the game, even while the computer is thinking
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE and user is not None:
+            if thinking is not None:
+                thinking.cancel()
+                thinking = None
+            user = None
+            board = ttt.initial_state(rows, columns)
+
     screen.fill(black)
 
     # Let user choose a player.
@@ -67,13 +97,12 @@ while True:
     else:
 
         # Draw game board
-        tile_size = 80
-        tile_origin = (width / 2 - (1.5 * tile_size),
-                       height / 2 - (1.5 * tile_size))
+        tile_origin = (width / 2 - (columns / 2 * tile_size),
+                       height / 2 - (rows / 2 * tile_size))
         tiles = []
-        for i in range(3):
+        for i in range(rows):
             row = []
-            for j in range(3):
+            for j in range(columns):
                 rect = pygame.Rect(
                     tile_origin[0] + j * tile_size,
                     tile_origin[1] + i * tile_size,
@@ -102,28 +131,38 @@ while True:
         elif user == player:
             title = f"Play as {user}"
         else:
-            title = f"Computer thinking..."
+            # dots grow while waiting, so the window visibly stays alive
+            dots = "." * (1 + int(time.time() * 2) % 3)
+            title = f"Computer thinking{dots:<3}"
         title = largeFont.render(title, True, white)
         titleRect = title.get_rect()
         titleRect.center = ((width / 2), 30)
         screen.blit(title, titleRect)
 
+        # Show how far the search has got
+        if thinking is not None and thinking.nodes:
+            progress = smallFont.render(
+                f"depth {thinking.depth}, {thinking.nodes:,} positions", True, white)
+            progressRect = progress.get_rect()
+            progressRect.center = ((width / 2), height - 20)
+            screen.blit(progress, progressRect)
+
         # Check for AI move
         if user != player and not game_over:
-            if ai_turn:
-                time.sleep(0.5)
-                move = ttt.minimax(board, alpha, beta)  # upgrading the arguments of the minimax() with board && alpha && beta
-                board = ttt.result(board, move)
-                ai_turn = False
-            else:
-                ai_turn = True
+            if thinking is None:
+                thinking = BackgroundMove(board)
+            elif thinking.elapsed() >= AI_DELAY:
+                move = thinking.result()
+                if move is not None:
+                    board = ttt.result(board, move)
+                    thinking = None
 
         # Check for a user move
         click, _, _ = pygame.mouse.get_pressed()
         if click == 1 and user == player and not game_over:
             mouse = pygame.mouse.get_pos()
-            for i in range(3):
-                for j in range(3):
+            for i in range(rows):
+                for j in range(columns):
                     if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse)):
                         board = ttt.result(board, (i, j))
 
@@ -140,7 +179,7 @@ while True:
                 if againButton.collidepoint(mouse):
                     time.sleep(0.2)
                     user = None
-                    board = ttt.initial_state()
-                    ai_turn = False
+                    board = ttt.initial_state(rows, columns)
 
     pygame.display.flip()
+    clock.tick(FPS)
@@ -0,0 +1,238 @@
+"""
+Time-limited search for m,n,k games
+
+On boards too large to solve, like 4x4 or 15x15 gomoku, the AI searches
+with iterative-deepening alpha-beta on bitboards: depth 1, then 2, and so
+on until the time budget runs out, answering with the best move of the
+deepest search that finished. Positions at the depth limit are scored by
+counting the lines each player could still complete, and moves are
+ordered by the transposition table, killer moves and the history
+heuristic so the deeper searches cut off early.
+"""
+
+import math
+import time
+
+# Seconds the AI may think about each move
+BUDGET = 1.0
+
+# Value of a won position; heuristic scores always stay below it
+WIN = 1000000
+
+# Checking the clock on every node would cost more than the search itself
+CLOCK_INTERVAL = 64
+
+# Called with (nodes searched, deepest depth finished) as a search runs,
+# for showing progress while the AI thinks
+progress = None
+
+# Collector notified of every node, cutoff and table probe when set; see stats.py
+stats = None
+
+# Boards with more cells than this only try cells next to a stone
+NEAR_CELLS = 16
+
+# Bound types stored in the transposition table
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class Timeout(Exception):
+    """
+    Raised inside the search when the time budget runs out
+    """
+
+
+class Search():
+    """
+    One move's worth of iterative-deepening search on a board shape
+    """
+
+    def __init__(self, shape, budget=None):
+        self.shape = shape
+        self.budget = BUDGET if budget is None else budget
+        self.progress = progress
+        if stats is not None:
+            stats.search_started(self)
+        # No limit until best_move starts the clock, for fixed-depth searches
+        self.deadline = math.inf
+        self.nodes = 0
+        self.depth = 0
+
+        # Maps (own, other) to (depth, value, bound, best cell)
+        self.table = {}
+
+        # Two moves per ply that caused a cutoff, tried early in sibling positions
+        self.killers = [[None, None] for _ in range(shape.cells + 1)]
+
+        # How much each cell has caused cutoffs, weighted towards deep searches
+        self.history = [0] * shape.cells
+
+        # Score of a line holding n stones of one player and none of the other
+        self.weights = [0] + [4 ** n for n in range(1, shape.length)] + [WIN]
+
+    def best_move(self, own, other):
+        """
+        Returns (cell, value) for the player to move, who holds own,
+        searching deeper until the budget runs out or the game is solved.
+        """
+        shape = self.shape
+        self.deadline = time.perf_counter() + self.budget
+        empty = shape.full & ~(own | other)
+        remaining = bin(empty).count("1")
+
+        # Any move beats no move if even depth 1 runs out of time
+        cell, value = self.candidates(own, other, empty, 0, None)[0], 0
+        for depth in range(1, remaining + 1):
+            try:
+                value, found = self.root(own, other, depth)
+            except Timeout:
+                break
+            cell, self.depth = found, depth
+            if abs(value) >= WIN:
+                # A forced win or loss was found, deeper searches cannot change it
+                break
+        return cell, value
+
+    def root(self, own, other, depth):
+        """
+        Searches every move at the root to depth, returning (value, cell).
+        """
+        value = self.alphabeta(own, other, depth, -WIN - 1, WIN + 1, 0)
+        return value, self.table[(own, other)][3]
+
+    def alphabeta(self, own, other, depth, alpha, beta, ply):
+        """
+        Returns the value of the position for the player to move, who holds
+        own, searched depth moves deep within the window (alpha, beta).
+        """
+        self.nodes += 1
+        if self.nodes % CLOCK_INTERVAL == 0:
+            if self.progress is not None:
+                self.progress(self.nodes, self.depth)
+            if time.perf_counter() > self.deadline:
+                raise Timeout
+
+        collector = stats
+        if collector is not None:
+            collector.node(bin(own | other).count("1"))
+        shape = self.shape
+        empty = shape.full & ~(own | other)
+        if not empty:
+            return 0
+        if depth == 0:
+            return self.evaluate(own, other)
+
+        # checking the transposition table before searching
+        first = None
+        entry = self.table.get((own, other))
+        if entry is not None:
+            stored_depth, value, bound, first = entry
+            # A proven win or loss holds however deep the search goes
+            settled = ((stored_depth >= depth or abs(value) >= WIN)
+                       and (bound == EXACT or (bound == LOWER and value >= beta)
+                            or (bound == UPPER and value <= alpha)))
+            if collector is not None:
+                collector.probe(True, settled)
+            if settled:
+                return value
+        elif collector is not None:
+            collector.probe(False, False)
+        alpha_original = alpha
+        if collector is not None:
+            collector.expand()
+
+        best_value, best_cell = -WIN - 1, None
+        for cell in self.candidates(own, other, empty, ply, first):
+            mine = own | 1 << cell
+            if shape.wins_with(mine, cell):
+                value = WIN
+            else:
+                value = -self.alphabeta(other, mine, depth - 1, -beta, -alpha, ply + 1)
+            if value > best_value:
+                best_value, best_cell = value, cell
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                if collector is not None:
+                    collector.cutoff()
+                killers = self.killers[ply]
+                if cell != killers[0]:
+                    killers[1], killers[0] = killers[0], cell
+                self.history[cell] += depth * depth
+                break
+
+        if best_value <= alpha_original:
+            bound = UPPER
+        elif best_value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table[(own, other)] = (depth, best_value, bound, best_cell)
+        return best_value
+
+    def principal_variation(self, own, other):
+        """
+        Returns the cells of the best line found from a position,
+        following the best moves stored in the table.
+        """
+        line = []
+        while True:
+            entry = self.table.get((own, other))
+            if entry is None or entry[3] is None or len(line) >= self.shape.cells:
+                return line
+            cell = entry[3]
+            line.append(cell)
+            mine = own | 1 << cell
+            if self.shape.wins_with(mine, cell) or mine | other == self.shape.full:
+                return line
+            own, other = other, mine
+
+    def candidates(self, own, other, empty, ply, first):
+        """
+        Returns the cells worth trying, best guesses first: the
+        transposition table move, the killer moves, then by history.
+
+        On large boards only cells next to a stone are tried, since a move
+        far from every stone cannot make or block a line any time soon.
+        """
+        shape = self.shape
+        stones = own | other
+        if not stones:
+            return [shape.order[0]]
+        if shape.cells > NEAR_CELLS:
+            near = 0
+            bits = stones
+            while bits:
+                low = bits & -bits
+                near |= shape.near[low.bit_length() - 1]
+                bits ^= low
+            empty &= near
+
+        history = self.history
+        cells = [cell for cell in shape.order if empty >> cell & 1]
+        cells.sort(key=lambda cell: -history[cell])
+        front = []
+        for cell in [first] + self.killers[ply]:
+            if cell is not None and empty >> cell & 1 and cell not in front:
+                front.append(cell)
+        if not front:
+            return cells
+        return front + [cell for cell in cells if cell not in front]
+
+    def evaluate(self, own, other):
+        """
+        Scores a position for the player to move by the lines each player
+        could still complete, weighted by how many stones they already hold.
+        """
+        weights = self.weights
+        score = 0
+        for mask in self.shape.wins:
+            mine = own & mask
+            theirs = other & mask
+            if mine:
+                if not theirs:
+                    score += weights[bin(mine).count("1")]
+            elif theirs:
+                score -= weights[bin(theirs).count("1")]
+        return score
@@ -0,0 +1,253 @@
+"""
+Search statistics for the Tic Tac Toe engines
+
+The engines call an optional collector at every node, table probe and
+beta cutoff. Turning it on installs a SearchStats in all of them and
+wraps tictactoe.minimax to time each call and record the principal
+variation; turning it off puts everything back, and the engines are left
+with a single None check per node.
+
+    import stats
+    collector = stats.enable()
+    ...
+    stats.disable()
+    collector.dump("stats.json")
+
+Searches run by parallel.py in worker processes are not counted.
+"""
+
+import json
+import math
+import time
+
+import bitboard
+import book
+import search
+import tictactoe as ttt
+
+# Modules that report to the collector
+ENGINES = (ttt, bitboard, search)
+
+# The collector turned on, and the minimax it wrapped
+collector = None
+wrapped = None
+
+
+class CallStats():
+    """
+    Counters for one minimax call
+    """
+
+    def __init__(self, marks=0):
+        self.marks = marks
+        self.nodes = 0
+        self.interior = 0
+        self.cutoffs = 0
+        self.probes = 0
+        self.hits = 0
+        self.table_cutoffs = 0
+        self.deepest = marks
+        self.seconds = 0.0
+        self.move = None
+        self.principal_variation = []
+
+    @property
+    def depth(self):
+        """
+        Deepest point reached, in moves beyond the searched position.
+        """
+        return self.deepest - self.marks
+
+    @property
+    def nodes_per_second(self):
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    @property
+    def cutoff_rate(self):
+        """
+        Share of searched positions whose moves were cut off early.
+        """
+        return self.cutoffs / self.interior if self.interior else 0.0
+
+    @property
+    def hit_rate(self):
+        """
+        Share of transposition table probes that found an entry.
+        """
+        return self.hits / self.probes if self.probes else 0.0
+
+    def add(self, other):
+        """
+        Adds the counters of other into this one.
+        """
+        self.nodes += other.nodes
+        self.interior += other.interior
+        self.cutoffs += other.cutoffs
+        self.probes += other.probes
+        self.hits += other.hits
+        self.table_cutoffs += other.table_cutoffs
+        self.deepest = max(self.deepest, self.marks + other.depth)
+        self.seconds += other.seconds
+
+    def as_dict(self):
+        return {
+            "move": self.move,
+            "seconds": self.seconds,
+            "nodes": self.nodes,
+            "nodes_per_second": self.nodes_per_second,
+            "depth": self.depth,
+            "cutoffs": self.cutoffs,
+            "cutoff_rate": self.cutoff_rate,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate,
+            "table_cutoffs": self.table_cutoffs,
+            "principal_variation": self.principal_variation,
+        }
+
+
+class SearchStats():
+    """
+    Statistics for every minimax call made while collection was on
+    """
+
+    def __init__(self):
+        self.calls = []
+
+        # Counters being filled in, including by searches outside minimax
+        self.current = CallStats()
+        self.searcher = None
+
+    # Hooks called by the engines
+
+    def node(self, marks):
+        current = self.current
+        current.nodes += 1
+        if marks > current.deepest:
+            current.deepest = marks
+
+    def expand(self):
+        self.current.interior += 1
+
+    def cutoff(self):
+        self.current.cutoffs += 1
+
+    def probe(self, found, settled):
+        current = self.current
+        current.probes += 1
+        if found:
+            current.hits += 1
+        if settled:
+            current.table_cutoffs += 1
+
+    def search_started(self, searcher):
+        self.searcher = searcher
+
+    # Recording minimax calls
+
+    def record(self, minimax, board, *args, **kwargs):
+        """
+        Calls minimax on board, recording its counters as one call.
+        """
+        outside = self.current
+        marks = sum(cell is not ttt.EMPTY for row in board for cell in row)
+        self.current = CallStats(marks)
+        self.searcher = None
+        start = time.perf_counter()
+        try:
+            move = minimax(board, *args, **kwargs)
+        finally:
+            self.current.seconds = time.perf_counter() - start
+            call, self.current = self.current, outside
+        call.move = move
+        if move is not None:
+            call.principal_variation = principal_variation(board, self.searcher)
+        self.calls.append(call)
+        return move
+
+    def as_dict(self):
+        calls = list(self.calls)
+        if self.current.nodes:
+            # Searches run directly rather than through minimax
+            calls.append(self.current)
+        total = CallStats()
+        for call in calls:
+            total.add(call)
+        summary = total.as_dict()
+        del summary["move"], summary["principal_variation"]
+        return {"calls": [call.as_dict() for call in calls], "total": summary}
+
+    def dump(self, path):
+        """
+        Writes the statistics to path as JSON.
+        """
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+
+def principal_variation(board, searcher=None):
+    """
+    Returns the best line of play from board as a list of (i, j) actions,
+    read back from whichever book or table the last search filled in.
+    """
+    rows, columns = len(board), len(board[0])
+    shape = bitboard.geometry(rows, columns, ttt.WIN_LENGTH)
+    x, o = ttt.to_bitboards(board)
+    own, other = (x, o) if ttt.player(board) == ttt.X else (o, x)
+
+    opening = book.load_book(shape) if ttt.BOOK else None
+    if opening is not None and opening.lookup(x, o) is not None:
+        cells = []
+        entry = opening.lookup(x, o)
+        while entry is not None:
+            cell = entry[1]
+            cells.append(cell)
+            if bin(x).count("1") == bin(o).count("1"):
+                x |= 1 << cell
+            else:
+                o |= 1 << cell
+            entry = opening.lookup(x, o)
+    elif ttt.BITBOARDS and searcher is not None:
+        cells = searcher.principal_variation(own, other)
+    elif ttt.BITBOARDS:
+        cells = bitboard.principal_variation(own, other, shape)
+    else:
+        line = []
+        while not ttt.terminal(board) and ttt.TRANSPOSITIONS:
+            _, action, _ = ttt.probe(board, -math.inf, math.inf)
+            if action is None:
+                break
+            line.append(action)
+            board = ttt.result(board, action)
+        return line
+    return [divmod(cell, columns) for cell in cells]
+
+
+def enable():
+    """
+    Turns collection on, returning the new SearchStats.
+    """
+    global collector, wrapped
+    disable()
+    collector = SearchStats()
+    wrapped = ttt.minimax
+
+    def minimax(board, *args, **kwargs):
+        return collector.record(wrapped, board, *args, **kwargs)
+
+    ttt.minimax = minimax
+    for engine in ENGINES:
+        engine.stats = collector
+    return collector
+
+
+def disable():
+    """
+    Turns collection off, leaving the engines as they were.
+    """
+    global collector, wrapped
+    for engine in ENGINES:
+        engine.stats = None
+    if wrapped is not None:
+        ttt.minimax = wrapped
+    collector = wrapped = None
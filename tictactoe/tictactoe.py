@@ -5,18 +5,60 @@ Tic Tac Toe Player
 import math
 import copy
 
+import bitboard
+import book
+import mcts
+import parallel
+import search
+
 X = "X"
 O = "O"
 EMPTY = None
 
+# Number of marks in a row, column or diagonal needed to win
+WIN_LENGTH = 3
+
+# Boards with more cells than this are searched with a time budget
+# instead of being solved exactly
+EXACT_CELLS = 9
+
+# Bound types stored in the transposition table
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Whether minimax plays from a book written by book.py when there is one
+BOOK = True
+
+# Whether minimax searches on bitboards instead of with MAX_PLAYER and MIN_PLAYER
+BITBOARDS = True
+
+# Whether minimax plays boards too large to solve with Monte Carlo tree search
+# instead of the time-limited alpha-beta search
+MCTS = False
+
+# Whether minimax searches the root moves in parallel on a process pool,
+# both when solving small boards and in the time-limited search of large ones
+PARALLEL = False
+
+# Whether MAX_PLAYER and MIN_PLAYER use the transposition table
+TRANSPOSITIONS = True
 
-def initial_state():
+# Collector notified of every node, cutoff and table probe when set; see stats.py
+stats = None
+
+# Maps a canonical board key to (value, bound, best move in canonical coordinates)
+transpositions = {}
+
+# Symmetry permutations of the flattened cells, for each board shape
+symmetries_cache = {}
+
+
+def initial_state(rows=3, columns=3):
     """
     Returns starting state of the board.
     """
-    return [[EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY]]
+    return [[EMPTY] * columns for _ in range(rows)]
 
 
 def player(board):
@@ -49,7 +91,7 @@ def actions(board):
     """
     possible_actiones = set()
     for row in range(len(board)):
-        for coulmn in range(len(board)):
+        for coulmn in range(len(board[row])):
             if board[row][coulmn] == EMPTY:
                 possible_actiones.add((row, coulmn))
     return possible_actiones
@@ -81,30 +123,23 @@ def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    # One can win the game with three of their moves in a row horizontally, vertically, or diagonally.
-
-    # checking horizontally
-    for row in board:
-        # if every cell in the row equal to the first cell ..
-        # (if the condition is true) .. then all() will return True
-        if all(cell == row[0] for cell in row) and row[0] != EMPTY:
-            return row[0]
-
-    # checking vertically
-    for coulmn in range(len(board)):
-        if all(board[row][coulmn] == board[0][coulmn] for row in range(len(board))):
-            return board[0][coulmn]
+    # One can win the game with WIN_LENGTH of their moves in a row horizontally, vertically, or diagonally.
+    rows, columns = len(board), len(board[0])
 
-    # checking diagonally
-
-    # checking for the left digonal
-    if all(board[i][i] == board[0][0] for i in range(len(board))):
-        return board[0][0]
-
-    # checking for the right digonal
-    # we will try to get the colmn dynimaclly by modifying the row
-    if all(board[row][len(board) - 1 - row] == board[0][len(board) - 1] for row in range(len(board))):
-        return board[0][len(board) - 1]
+    # starting from every mark, checking right, down and both diagonals
+    for row in range(rows):
+        for coulmn in range(columns):
+            cell = board[row][coulmn]
+            if cell is EMPTY:
+                continue
+            for step_row, step_coulmn in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row = row + step_row * (WIN_LENGTH - 1)
+                end_coulmn = coulmn + step_coulmn * (WIN_LENGTH - 1)
+                if not (0 <= end_row < rows and 0 <= end_coulmn < columns):
+                    continue
+                if all(board[row + step_row * n][coulmn + step_coulmn * n] == cell
+                       for n in range(1, WIN_LENGTH)):
+                    return cell
 
     # check for the game if ( is ongoing || ended as a draw )
     for row in board:
@@ -147,49 +182,296 @@ def utility(board):
     else:
         return 0
 
+
+def to_bitboards(board):
+    """
+    Returns (x, o) bitboards for board, where bit i * columns + j
+    is set when that player holds cell (i, j).
+    """
+    x = o = 0
+    bit = 1
+    for row in board:
+        for cell in row:
+            if cell == X:
+                x |= bit
+            elif cell == O:
+                o |= bit
+            bit <<= 1
+    return x, o
+
+
+class Game():
+    """
+    A board that moves are made and unmade on in place, so searching it
+    never copies the board. The player to move, the empty cells, the
+    number of moves made and the winner are kept up to date move by move
+    instead of being recounted from the whole board.
+    """
+
+    def __init__(self, board):
+        # Copied once, so the caller's board is left alone
+        self.board = [list(row) for row in board]
+        self.to_move = player(board)
+        self.empty = [(i, j) for i, row in enumerate(board)
+                      for j, cell in enumerate(row) if cell is EMPTY]
+        self.moves = len(board) * len(board[0]) - len(self.empty)
+        self.winner = winner(board)
+
+        # (action, where it was in empty, winner before it) for each move made
+        self.history = []
+
+    def make(self, action):
+        """
+        Plays action for the player to move.
+        """
+        empty = self.empty
+        if self.winner is not None or action not in empty:
+            raise Exception("This is not a valid action")
+
+        # The last empty cell takes the place of the played one
+        index = empty.index(action)
+        last = empty.pop()
+        if index < len(empty):
+            empty[index] = last
+        self.history.append((action, index, self.winner))
+
+        i, j = action
+        mark = self.to_move
+        self.board[i][j] = mark
+        if self.completes_line(i, j):
+            self.winner = mark
+        self.to_move = O if mark == X else X
+        self.moves += 1
+
+    def unmake(self):
+        """
+        Takes back the last move made.
+        """
+        (i, j), index, self.winner = self.history.pop()
+        self.board[i][j] = EMPTY
+        empty = self.empty
+        if index < len(empty):
+            empty.append(empty[index])
+            empty[index] = (i, j)
+        else:
+            empty.append((i, j))
+        self.to_move = O if self.to_move == X else X
+        self.moves -= 1
+
+    def completes_line(self, i, j):
+        """
+        Returns True if the mark at (i, j) is part of WIN_LENGTH in a row.
+        """
+        board = self.board
+        rows, columns = len(board), len(board[0])
+        mark = board[i][j]
+        for step_i, step_j in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            count = 1
+            for direction in (1, -1):
+                row, coulmn = i + step_i * direction, j + step_j * direction
+                while 0 <= row < rows and 0 <= coulmn < columns and board[row][coulmn] == mark:
+                    count += 1
+                    row, coulmn = row + step_i * direction, coulmn + step_j * direction
+            if count >= WIN_LENGTH:
+                return True
+        return False
+
+    def terminal(self):
+        return self.winner is not None or not self.empty
+
+    def utility(self):
+        if self.winner == X:
+            return 1
+        elif self.winner == O:
+            return -1
+        return 0
+
+
+def symmetries(rows, columns):
+    """
+    Returns the rotations and reflections of a rows x columns board, each
+    as a tuple p of flat cell indices where the transformed board's cell k
+    is the original board's cell p[k]. Square boards have 8, others 4.
+    """
+    if (rows, columns) not in symmetries_cache:
+        transforms = [
+            lambda i, j: (i, j),
+            lambda i, j: (rows - 1 - i, columns - 1 - j),
+            lambda i, j: (i, columns - 1 - j),
+            lambda i, j: (rows - 1 - i, j),
+        ]
+        if rows == columns:
+            size = rows
+            transforms += [
+                lambda i, j: (j, size - 1 - i),
+                lambda i, j: (size - 1 - j, i),
+                lambda i, j: (j, i),
+                lambda i, j: (size - 1 - j, size - 1 - i),
+            ]
+        permutations = []
+        for transform in transforms:
+            permutation = []
+            for i in range(rows):
+                for j in range(columns):
+                    row, coulmn = transform(i, j)
+                    permutation.append(row * columns + coulmn)
+            permutations.append(tuple(permutation))
+        # Symmetric boards would give the same permutation twice
+        symmetries_cache[(rows, columns)] = list(dict.fromkeys(permutations))
+    return symmetries_cache[(rows, columns)]
+
+
+def canonical(board):
+    """
+    Returns (key, permutation) where key is the same string for all
+    symmetric versions of board, and permutation maps it back to board.
+    """
+    rows, columns = len(board), len(board[0])
+    cells = "".join(cell or "." for row in board for cell in row)
+    # The shape and win length are part of the key, so one table serves every variant
+    shape = f"{rows}x{columns}/{WIN_LENGTH}:"
+    return min((shape + "".join(cells[p] for p in permutation), permutation)
+               for permutation in symmetries(rows, columns))
+
+
+def probe(board, alpha, beta):
+    """
+    Looks board up in the transposition table.
+
+    Returns (value, best_action, hit), where hit is True if the stored value
+    settles the search within (alpha, beta). best_action is the stored best
+    move on board, to be tried first, or None.
+    """
+    key, permutation = canonical(board)
+    entry = transpositions.get(key)
+    if entry is None:
+        return None, None, False
+    value, bound, move = entry
+    best_action = None
+    if move is not None:
+        best_action = divmod(permutation[move], len(board[0]))
+    hit = (bound == EXACT
+           or (bound == LOWER and value >= beta)
+           or (bound == UPPER and value <= alpha))
+    return value, best_action, hit
+
+
+def store(board, value, best_action, alpha, beta):
+    """
+    Stores the value a search of board found within (alpha, beta).
+    """
+    key, permutation = canonical(board)
+    if value <= alpha:
+        bound = UPPER
+    elif value >= beta:
+        bound = LOWER
+    else:
+        bound = EXACT
+    move = None
+    if best_action is not None:
+        move = permutation.index(best_action[0] * len(board[0]) + best_action[1])
+    transpositions[key] = (value, bound, move)
+
+
+def ordered_actions(game, first):
+    """
+    Returns the actions on a Game with first, if any, moved to the front.
+    """
+    # A copy, since making and unmaking moves reorders game.empty
+    possible_actions = list(game.empty)
+    if first is None or first not in possible_actions:
+        return possible_actions
+    possible_actions.remove(first)
+    return [first, *possible_actions]
+
+
 # Note THAT THE MIN_PLAYER(board) && MAX_PLAYER(board) should return the value of the result action to be used in their opponent
 # AND it should return the action (best_action)(i,j) to use it in the minimax function
 
 
 def MIN_PLAYER(board, alpha, beta):
+    # moves are made and unmade on one Game for the whole search
+    game = board if isinstance(board, Game) else Game(board)
+    if stats is not None:
+        stats.node(game.moves)
+
     # if the board is terminal board
-    is_terminal = terminal(board)
-    if is_terminal:
-        return utility(board), None  # Return a tuple with utility value and no action
+    if game.terminal():
+        return game.utility(), None  # Return a tuple with utility value and no action
+
+    # checking the transposition table before searching
+    first = None
+    if TRANSPOSITIONS:
+        value, first, hit = probe(game.board, alpha, beta)
+        if stats is not None:
+            stats.probe(value is not None, hit)
+        if hit:
+            return value, first
+    alpha_original, beta_original = alpha, beta
+    if stats is not None:
+        stats.expand()
 
     # Function Min-Value(state):
     best_action = None
     v = float('inf')
-    for action in actions(board):
+    for action in ordered_actions(game, first):
         # getting only the value(new_value) from the tuple
-        new_value, _ = MAX_PLAYER(result(board, action), alpha, beta)
+        game.make(action)
+        new_value, _ = MAX_PLAYER(game, alpha, beta)
+        game.unmake()
         if new_value < v:
             v = new_value
             best_action = action
         beta = min(beta, v)
         if beta <= alpha:
+            if stats is not None:
+                stats.cutoff()
             break
+    if TRANSPOSITIONS:
+        store(game.board, v, best_action, alpha_original, beta_original)
     return v, best_action  # Return a tuple with the minimum value and the best action
 
 
 def MAX_PLAYER(board, alpha, beta):
+    # moves are made and unmade on one Game for the whole search
+    game = board if isinstance(board, Game) else Game(board)
+    if stats is not None:
+        stats.node(game.moves)
+
     # if the board is terminal board
-    is_terminal = terminal(board)
-    if is_terminal:
-        return utility(board), None  # Return a tuple with utility value and no action
+    if game.terminal():
+        return game.utility(), None  # Return a tuple with utility value and no action
+
+    # checking the transposition table before searching
+    first = None
+    if TRANSPOSITIONS:
+        value, first, hit = probe(game.board, alpha, beta)
+        if stats is not None:
+            stats.probe(value is not None, hit)
+        if hit:
+            return value, first
+    alpha_original, beta_original = alpha, beta
+    if stats is not None:
+        stats.expand()
 
     # function Max-Value
     best_action = None
     v = float('-inf')
-    for action in actions(board):
+    for action in ordered_actions(game, first):
         # getting only the value(new_value) from the tuple
-        new_value, _ = MIN_PLAYER(result(board, action), alpha, beta)
+        game.make(action)
+        new_value, _ = MIN_PLAYER(game, alpha, beta)
+        game.unmake()
         if new_value > v:
             v = new_value
             best_action = action
         alpha = max(alpha, v)
         if beta <= alpha:
+            if stats is not None:
+                stats.cutoff()
             break
+    if TRANSPOSITIONS:
+        store(game.board, v, best_action, alpha_original, beta_original)
     return v, best_action  # Return a tuple with the maximum value and the best action
 
 
@@ -201,6 +483,37 @@ def minimax(board, alpha=float('-inf'), beta=float('inf')):
 
     # determining the current player (MAX-PLAYER  || MIN-PLAYER)
     current_player = player(board)
+
+    shape = bitboard.geometry(len(board), len(board[0]), WIN_LENGTH)
+    x, o = to_bitboards(board)
+
+    # looking the move up in the book, if one was written for this board
+    if BOOK:
+        opening = book.load_book(shape)
+        if opening is not None:
+            entry = opening.lookup(x, o)
+            if entry is not None:
+                return divmod(entry[1], shape.columns)
+
+    # searching on bitboards, from the point of view of the current player
+    if BITBOARDS:
+        own, other = (x, o) if current_player == X else (o, x)
+        if shape.cells > EXACT_CELLS:
+            # too large to solve, so searching as deep as the time budget allows
+            if MCTS:
+                cell, _ = mcts.get_player(shape).best_move(own, other)
+            elif PARALLEL:
+                cell, _ = parallel.iterative_best_move(own, other, shape)
+            else:
+                cell, _ = search.Search(shape).best_move(own, other)
+        elif PARALLEL:
+            cell, _ = parallel.best_move(own, other, shape)
+        elif current_player == X:
+            _, cell = bitboard.negamax(own, other, alpha, beta, shape)
+        else:
+            _, cell = bitboard.negamax(own, other, -beta, -alpha, shape)
+        return divmod(cell, shape.columns)
+
     if current_player == X:
         # getting from the tubel that MAX_PLAYER(board,alpha,beta) will produce the best_action only and not the value with it
         _, best_action = MAX_PLAYER(board, alpha, beta)